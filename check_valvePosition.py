@@ -11,10 +11,16 @@ Das Skript führt eine SQL-Abfrage aus, um Geräte zu finden, deren Ventilpositi
 """
 
 import os
+import re
 import sys
 import argparse
 import json
 import requests
+from collections import namedtuple
+from itertools import chain, islice
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 
 # Lade Umgebungsvariablen aus .env
@@ -36,6 +42,41 @@ TENANT_ID = '7e3d1eb0-5318-11ef-a22a-49a76fa570ac'
 BRAND = 'dnt'
 DEVICE_TYPE = 'dnt-lw-etrv-c'
 
+# Anzahl Zeilen, die der serverseitige Cursor pro Roundtrip holt
+QUERY_ITERSIZE = 1000
+
+# Ergebniszeile der Ventilpositions-Abfrage
+ValveRow = namedtuple('ValveRow', ['device_id', 'percent_valve_open_ts_utc'])
+
+# Downlink-Inhalt (Abfrage der Ventilposition)
+DOWNLINK_FRM_PAYLOAD = "03F4"
+
+# Vorformatierter Request-Body eines Downlinks, nur deviceId ist variabel
+_BODY_TMPL = (
+    b'{"deviceId":"%s","frm_payload":"' + DOWNLINK_FRM_PAYLOAD.encode() +
+    b'","confirmed":false,"priority":"NORMAL"}'
+)
+
+# Erlaubte Zeichen einer Device ID (mit fullmatch, hält den Body-Template injektionssicher)
+_DEVICE_ID_RE = re.compile(r'[A-Za-z0-9_-]+')
+
+# Maximale Anzahl parallel gesendeter Downlinks
+MAX_WORKERS = 32
+
+# Anzahl Downlinks pro Request an den Batch-Endpunkt der LNS API
+BATCH_SIZE = 100
+
+# HTTP Konfiguration
+REQUEST_TIMEOUT = 30
+REQUEST_RETRIES = 3
+
+# Gemeinsame HTTP-Session für alle LNS-Aufrufe (Keep-Alive, Connection-Pooling)
+# Die Adapter werden in configure_session() passend zur Worker-Anzahl gemountet
+SESSION = requests.Session()
+
+# PostgreSQL Connection-Pool (wird bei der ersten Verbindung angelegt)
+_POOL = None
+
 
 def parse_arguments():
     """Parst die Kommandozeilenargumente"""
@@ -82,13 +123,54 @@ def parse_arguments():
         default=LNS_API_KEY,
         help='LNS API Key (Standard: aus .env)'
     )
+    parser.add_argument(
+        '--max-workers',
+        type=int,
+        default=MAX_WORKERS,
+        help=f'Maximale Anzahl parallel gesendeter Downlinks (Standard: {MAX_WORKERS})'
+    )
     
     return parser.parse_args()
 
 
+def configure_session(api_key, max_workers=MAX_WORKERS):
+    """
+    Konfiguriert die LNS-Session einmalig vor dem Senden
+    
+    Der Connection-Pool wird mindestens so groß wie die Anzahl der Worker-Threads
+    gewählt, damit sich die Threads keine Verbindungen wegnehmen.
+    
+    Args:
+        api_key: LNS API Key
+        max_workers: Anzahl paralleler Worker-Threads
+    """
+    # POST wird explizit wiederholt: ein doppelter Status-Request (03F4) ist unkritisch
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=max_workers,
+        max_retries=Retry(
+            total=REQUEST_RETRIES,
+            backoff_factor=0.3,
+            status_forcelist=[502, 503, 504],
+            raise_on_status=False,
+            allowed_methods=frozenset(['POST'])
+        )
+    )
+    SESSION.mount('http://', adapter)
+    SESSION.mount('https://', adapter)
+    
+    SESSION.headers.update({
+        "Content-Type": "application/json",
+        "X-API-Key": api_key
+    })
+
+
 def get_database_connection(host, port, database, user, password):
     """
-    Erstellt eine Verbindung zur PostgreSQL-Datenbank
+    Holt eine Verbindung aus dem PostgreSQL Connection-Pool
+    
+    Der Pool wird beim ersten Aufruf angelegt und danach wiederverwendet, so dass
+    wiederholte Aufrufe (z.B. aus einem Daemon) keinen neuen Verbindungsaufbau bezahlen.
     
     Args:
         host: PostgreSQL Host
@@ -100,16 +182,28 @@ def get_database_connection(host, port, database, user, password):
     Returns:
         psycopg2.Connection: Datenbankverbindung oder None bei Fehler
     """
+    global _POOL
+    
     try:
-        import psycopg2
+        from psycopg2 import pool
         
         if not all([host, database, user, password]):
             print("❌ Fehlende PostgreSQL-Verbindungsdaten", file=sys.stderr)
             print("   Bitte PG_HOST, PG_DATABASE, PG_USER, PG_PASSWORD in .env setzen", file=sys.stderr)
             return None
         
-        conn_str = f"host={host} port={port} dbname={database} user={user} password={password}"
-        conn = psycopg2.connect(conn_str)
+        if _POOL is None:
+            _POOL = pool.ThreadedConnectionPool(
+                minconn=1,
+                maxconn=10,
+                host=host,
+                port=port,
+                dbname=database,
+                user=user,
+                password=password
+            )
+        
+        conn = _POOL.getconn()
         print(f"✅ PostgreSQL-Verbindung erfolgreich: {host}:{port}/{database}")
         return conn
         
@@ -122,49 +216,88 @@ def get_database_connection(host, port, database, user, password):
         return None
 
 
+def release_connection(conn):
+    """
+    Gibt eine Verbindung an den Connection-Pool zurück
+    
+    Args:
+        conn: PostgreSQL-Verbindung aus get_database_connection()
+    """
+    if _POOL is not None:
+        _POOL.putconn(conn)
+    else:
+        conn.close()
+
+
+def close_pool():
+    """Schließt alle Verbindungen des Connection-Pools"""
+    global _POOL
+    
+    if _POOL is not None:
+        _POOL.closeall()
+        _POOL = None
+
+
 def execute_query(conn):
     """
     Führt die SQL-Abfrage aus, um Geräte mit veralteten Ventilpositionen zu finden
     
+    Die Abfrage läuft über einen serverseitigen Cursor, die Zeilen werden in Blöcken
+    von QUERY_ITERSIZE geholt und einzeln geliefert. Passender Index: siehe
+    sql/idx_valve_stale.sql
+    
     Args:
         conn: PostgreSQL-Verbindung
     
-    Returns:
-        list: Liste von Dictionaries mit den Ergebnissen
+    Yields:
+        ValveRow: (device_id, percent_valve_open_ts_utc) je Gerät
     """
     query = """
-    SELECT *
+    SELECT device_id, percent_valve_open_ts_utc
     FROM hmreporting.v_device_valve_last
-    WHERE (percent_valve_open_ts_utc IS NULL
-       OR percent_valve_open_ts_utc < now() - interval '2 hour' )
+    WHERE COALESCE(percent_valve_open_ts_utc, '-infinity') < now() - interval '2 hour'
     AND tenant_id = %s
     AND brand = %s
-    AND devicetype IN %s
+    AND devicetype = ANY(%s::text[])
     """
     
+    cursor = None
     try:
-        cursor = conn.cursor()
-        # Konvertiere DEVICE_TYPE zu einem Tuple für IN-Klausel
-        device_types = tuple([DEVICE_TYPE] if isinstance(DEVICE_TYPE, str) else DEVICE_TYPE)
+        cursor = conn.cursor(name='valve_stale_cur')
+        cursor.itersize = QUERY_ITERSIZE
+        # DEVICE_TYPE als Liste übergeben: psycopg2 macht daraus ein Postgres-Array,
+        # der Plan ist damit unabhängig von der Anzahl der Device-Typen
+        device_types = [DEVICE_TYPE] if isinstance(DEVICE_TYPE, str) else list(DEVICE_TYPE)
         cursor.execute(query, (TENANT_ID, BRAND, device_types))
         
-        # Hole Spaltennamen
-        columns = [desc[0] for desc in cursor.description]
-        
-        # Konvertiere Ergebnisse zu Dictionaries
-        results = []
-        for row in cursor.fetchall():
-            row_dict = dict(zip(columns, row))
-            results.append(row_dict)
-        
-        cursor.close()
-        return results
+        for row in cursor:
+            yield ValveRow._make(row)
         
     except Exception as e:
         print(f"❌ Fehler beim Ausführen der SQL-Abfrage: {e}", file=sys.stderr)
         import traceback
         traceback.print_exc()
-        return []
+    finally:
+        if cursor is not None:
+            cursor.close()
+
+
+def build_downlink(device_id):
+    """
+    Erstellt den Downlink-Eintrag für ein Gerät
+    
+    Args:
+        device_id: Device ID
+    
+    Returns:
+        dict: Downlink-Payload für die LNS API
+    """
+    return {
+        "deviceId": device_id,
+        "frm_payload": DOWNLINK_FRM_PAYLOAD,
+        "confirmed": False,
+        "priority": "NORMAL"
+    }
 
 
 def send_downlink(device_id, api_url, api_key, dry_run=False):
@@ -184,29 +317,21 @@ def send_downlink(device_id, api_url, api_key, dry_run=False):
         print(f"❌ LNS_API_KEY fehlt in .env", file=sys.stderr)
         return False
     
-    payload = {
-        "deviceId": device_id,
-        "frm_payload": "03F4",
-        "confirmed": False,
-        "priority": "NORMAL"
-    }
-    
-    headers = {
-        "Content-Type": "application/json",
-        "X-API-Key": api_key
-    }
+    device_id = str(device_id)
+    if not _DEVICE_ID_RE.fullmatch(device_id):
+        print(f"❌ Ungültige Device ID übersprungen: {device_id!r}", file=sys.stderr)
+        return False
     
     if dry_run:
         print(f"🔍 DRY-RUN: Würde Downlink senden für Device {device_id}")
-        print(f"   Payload: {json.dumps(payload, indent=2)}")
+        print(f"   Payload: {json.dumps(build_downlink(device_id), indent=2)}")
         return True
     
     try:
-        response = requests.post(
+        response = SESSION.post(
             api_url,
-            json=payload,
-            headers=headers,
-            timeout=30
+            data=_BODY_TMPL % device_id.encode(),
+            timeout=REQUEST_TIMEOUT
         )
         
         if response.status_code in [200, 201, 202]:
@@ -222,6 +347,165 @@ def send_downlink(device_id, api_url, api_key, dry_run=False):
         return False
 
 
+def send_downlinks(device_ids, api_url, api_key, dry_run=False, max_workers=MAX_WORKERS):
+    """
+    Sendet Downlink-Nachrichten parallel für mehrere Geräte
+    
+    Die Aufrufe sind rein I/O-gebunden (HTTP), daher werden sie über einen
+    Thread-Pool verteilt statt nacheinander abgearbeitet.
+    
+    Args:
+        device_ids: Iterable von Device IDs (Liste oder Generator)
+        api_url: LNS API URL
+        api_key: LNS API Key
+        dry_run: Wenn True, wird nur simuliert
+        max_workers: Maximale Anzahl gleichzeitiger Anfragen
+    
+    Returns:
+        list: Ergebnis (True/False) je Device, in der Reihenfolge von device_ids
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(
+            lambda device_id: send_downlink(device_id, api_url, api_key, dry_run),
+            device_ids
+        ))
+
+
+def send_downlink_chunk(device_ids, batch_url, dry_run=False):
+    """
+    Sendet mehrere Downlinks in einem Request an den Batch-Endpunkt der LNS API
+    
+    Args:
+        device_ids: Liste von Device IDs (ein Batch)
+        batch_url: URL des Batch-Endpunkts
+        dry_run: Wenn True, wird nur simuliert
+    
+    Returns:
+        bool: True wenn erfolgreich, False bei Fehler,
+              None wenn der Batch-Endpunkt nicht unterstützt wird
+    """
+    payload = {"downlinks": [build_downlink(device_id) for device_id in device_ids]}
+    
+    if dry_run:
+        # Eine Ausgabe pro Batch, damit parallel laufende Batches nicht durchmischt werden
+        lines = [f"🔍 DRY-RUN: Würde {len(device_ids)} Downlink(s) gebündelt senden an {batch_url}"]
+        lines.extend(f"   Payload: {json.dumps(downlink, indent=2)}" for downlink in payload["downlinks"])
+        print("\n".join(lines))
+        return True
+    
+    try:
+        response = SESSION.post(
+            batch_url,
+            json=payload,
+            timeout=REQUEST_TIMEOUT
+        )
+        
+        if response.status_code in [200, 201, 202]:
+            print(f"✅ {len(device_ids)} Downlink(s) erfolgreich gebündelt gesendet")
+            return True
+        elif response.status_code in [404, 405]:
+            return None
+        else:
+            print(f"❌ Fehler beim gebündelten Senden von {len(device_ids)} Downlink(s): {response.status_code}")
+            print(f"   Response: {response.text}")
+            return False
+            
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Fehler beim Batch-API-Aufruf: {e}", file=sys.stderr)
+        return False
+
+
+def send_downlinks_batch(device_ids, api_url, api_key, dry_run=False, batch_size=BATCH_SIZE,
+                         max_workers=MAX_WORKERS):
+    """
+    Sendet Downlink-Nachrichten gebündelt über den Batch-Endpunkt der LNS API
+    
+    Statt eines Requests pro Gerät wird ein Request pro batch_size Geräte gesendet.
+    Unterstützt die LNS API keinen Batch-Endpunkt (HTTP 404/405), werden die
+    verbleibenden Geräte einzeln über send_downlinks() gesendet.
+    
+    device_ids darf ein Generator sein (z.B. direkt aus execute_query): Jeder Batch
+    wird abgeschickt, sobald er voll ist, während die nächsten Zeilen noch aus der
+    Datenbank gelesen werden.
+    
+    Args:
+        device_ids: Iterable von Device IDs (Liste oder Generator)
+        api_url: LNS API URL
+        api_key: LNS API Key
+        dry_run: Wenn True, wird nur simuliert
+        batch_size: Anzahl Downlinks pro Request
+        max_workers: Maximale Anzahl gleichzeitiger Requests
+    
+    Returns:
+        list: Ergebnis (True/False) je Device, in der Reihenfolge von device_ids
+    """
+    remaining = iter(device_ids)
+    
+    if not api_key:
+        print(f"❌ LNS_API_KEY fehlt in .env", file=sys.stderr)
+        return [False for _ in remaining]
+    
+    batch_url = f"{api_url.rstrip('/')}/batch"
+    
+    # Erster Batch synchron: klärt, ob der Batch-Endpunkt unterstützt wird
+    first_chunk = list(islice(remaining, batch_size))
+    if not first_chunk:
+        return []
+    
+    success = send_downlink_chunk(first_chunk, batch_url, dry_run)
+    
+    if success is None:
+        print(f"ℹ️  Batch-Endpunkt nicht verfügbar - sende Downlinks einzeln")
+        return send_downlinks(chain(first_chunk, remaining), api_url, api_key, dry_run, max_workers)
+    
+    results = [success] * len(first_chunk)
+    
+    # Weitere Batches parallel senden, während der Generator weiter liest
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = []
+        while True:
+            chunk = list(islice(remaining, batch_size))
+            if not chunk:
+                break
+            pending.append((chunk, executor.submit(send_downlink_chunk, chunk, batch_url, dry_run)))
+        
+        for chunk, future in pending:
+            chunk_success = future.result()
+            if chunk_success is None:
+                # Batch-Endpunkt nachträglich nicht mehr verfügbar: diesen Batch einzeln senden
+                print(f"⚠️  Batch-Endpunkt nicht verfügbar - sende {len(chunk)} Downlink(s) einzeln")
+                results.extend(send_downlinks(chunk, api_url, api_key, dry_run, max_workers))
+                continue
+            results.extend([chunk_success] * len(chunk))
+    
+    return results
+
+
+def iter_device_ids(devices, skipped):
+    """
+    Zeigt die gefundenen Geräte an und liefert ihre Device IDs
+    
+    Args:
+        devices: Iterable von ValveRow (z.B. execute_query)
+        skipped: Liste, an die Geräte ohne Device ID angehängt werden
+    
+    Yields:
+        Device ID je Gerät
+    """
+    for i, device in enumerate(devices, 1):
+        device_id = device.device_id
+        print(f"   {i}. Device ID: {device_id}")
+        print(f"      Letzte Ventilposition: {device.percent_valve_open_ts_utc}")
+        
+        # Nur NULL ist "keine ID" - falsy Werte wie 0 sind gültige IDs
+        if device_id is None or device_id == '':
+            print(f"⚠️  Gerät ohne Device ID übersprungen: {device}")
+            skipped.append(device)
+            continue
+        
+        yield device_id
+
+
 def main():
     """Hauptfunktion"""
     print("=" * 80)
@@ -241,6 +525,12 @@ def main():
         print("   Bitte PG_USER und PG_PASSWORD in .env setzen", file=sys.stderr)
         sys.exit(1)
     
+    if args.max_workers < 1:
+        print("❌ --max-workers muss mindestens 1 sein", file=sys.stderr)
+        sys.exit(1)
+    
+    configure_session(args.lns_api_key, args.max_workers)
+    
     # Datenbankverbindung herstellen
     print(f"\n1. Verbinde mit PostgreSQL-Datenbank...")
     conn = get_database_connection(
@@ -262,45 +552,30 @@ def main():
         print(f"   Brand: {BRAND}")
         print(f"   Device Type: {DEVICE_TYPE}")
         
-        devices = execute_query(conn)
+        # Geräte werden direkt aus dem Cursor gesendet, während weitere Zeilen geladen werden
+        print(f"\n3. Gefundene Geräte / Sende Downlink-Nachrichten...")
+        skipped = []
+        results = send_downlinks_batch(
+            iter_device_ids(execute_query(conn), skipped),
+            args.lns_api_url,
+            args.lns_api_key,
+            args.dry_run,
+            max_workers=args.max_workers
+        )
         
-        if not devices:
+        device_count = len(results) + len(skipped)
+        if not device_count:
             print(f"\n✅ Keine Geräte gefunden, die eine Downlink-Nachricht benötigen")
             return
         
-        print(f"\n✅ {len(devices)} Gerät(e) gefunden, die eine Downlink-Nachricht benötigen")
-        
-        # Zeige gefundene Geräte an
-        print(f"\n3. Gefundene Geräte:")
-        for i, device in enumerate(devices, 1):
-            device_id = device.get('device_id') or device.get('deviceId') or device.get('id')
-            print(f"   {i}. Device ID: {device_id}")
-            if 'percent_valve_open_ts_utc' in device:
-                print(f"      Letzte Ventilposition: {device['percent_valve_open_ts_utc']}")
-        
-        # Sende Downlink-Nachrichten
-        print(f"\n4. Sende Downlink-Nachrichten...")
-        success_count = 0
-        error_count = 0
-        
-        for device in devices:
-            device_id = device.get('device_id') or device.get('deviceId') or device.get('id')
-            
-            if not device_id:
-                print(f"⚠️  Gerät ohne Device ID übersprungen: {device}")
-                error_count += 1
-                continue
-            
-            if send_downlink(device_id, args.lns_api_url, args.lns_api_key, args.dry_run):
-                success_count += 1
-            else:
-                error_count += 1
+        success_count = sum(results)
+        error_count = len(skipped) + len(results) - success_count
         
         # Zusammenfassung
         print(f"\n{'='*80}")
         print("ZUSAMMENFASSUNG")
         print(f"{'='*80}")
-        print(f"Gefundene Geräte: {len(devices)}")
+        print(f"Gefundene Geräte: {device_count}")
         print(f"Erfolgreich gesendet: {success_count}")
         print(f"Fehler: {error_count}")
         
@@ -308,11 +583,13 @@ def main():
             print(f"\n🔍 DRY-RUN Modus - Keine tatsächlichen API-Aufrufe durchgeführt")
         
     finally:
-        # Datenbankverbindung schließen
-        conn.close()
-        print(f"\n✅ Datenbankverbindung geschlossen")
+        # Datenbankverbindung an den Pool zurückgeben
+        release_connection(conn)
+        print(f"\n✅ Datenbankverbindung freigegeben")
 
 
 if __name__ == "__main__":
-    main()
-
+    try:
+        main()
+    finally:
+        close_pool()
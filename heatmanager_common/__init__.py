@@ -1,26 +1,52 @@
 # heatmanager_common package
 # Zentrale Funktionen für Heatmanager Python-Skripte
 
-from .melita import (
-    generate_melita_bearer_token,
-    get_melita_headers,
-    send_melita_queue_message,
-    flush_melita_device_queue,
-    check_melita_connection,
-    create_temperature_hex_payload,
-    hex_to_base64,
-    send_temperature_to_vicki_device,
-    send_temperature_to_all_vicki_devices
+from .ratelimit import TokenBucket
+
+# Melita.io Funktionen werden erst beim ersten Zugriff importiert (siehe __getattr__),
+# damit Skripte ohne Melita.io (z.B. nur config/ratelimit) melita.py nicht laden
+_MELITA_NAMES = (
+    'MelitaClient',
+    'setup_melita_logging',
+    'generate_melita_bearer_token',
+    'get_melita_headers',
+    'send_melita_queue_message',
+    'flush_melita_device_queue',
+    'check_melita_connection',
+    'create_temperature_hex_payload',
+    'hex_to_base64',
+    'build_vicki_payload',
+    'build_vicki_payloads_bulk',
+    'send_temperature_to_vicki_device',
+    'send_temperature_to_all_vicki_devices'
 )
 
+
+def __getattr__(name):
+    """Importiert melita.py beim ersten Zugriff auf eine Melita.io Funktion (PEP 562)"""
+    if name in _MELITA_NAMES:
+        from . import melita
+        return getattr(melita, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_MELITA_NAMES))
+
+
 __all__ = [
+    'MelitaClient',
+    'TokenBucket',
+    'setup_melita_logging',
     'generate_melita_bearer_token',
-    'get_melita_headers', 
+    'get_melita_headers',
     'send_melita_queue_message',
     'flush_melita_device_queue',
     'check_melita_connection',
     'create_temperature_hex_payload',
     'hex_to_base64',
+    'build_vicki_payload',
+    'build_vicki_payloads_bulk',
     'send_temperature_to_vicki_device',
     'send_temperature_to_all_vicki_devices'
 ]
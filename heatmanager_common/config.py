@@ -6,6 +6,8 @@ Enthält alle gemeinsamen Einstellungen und Konfigurationen
 """
 
 import os
+import types
+from functools import lru_cache
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -14,38 +16,68 @@ from dotenv import load_dotenv
 current_dir = Path(__file__).parent
 project_root = current_dir.parent  # heatmanager_common -> pythonscripts
 
-# .env Datei laden - versuche zuerst im Projektroot, dann im aktuellen Verzeichnis
-env_path = project_root / '.env'
-if not env_path.exists():
-    env_path = current_dir / '.env'
-if not env_path.exists():
-    env_path = Path('.env')  # Fallback: aktuelles Arbeitsverzeichnis
-
-load_dotenv(dotenv_path=env_path)
-
 # ThingsBoard Konfiguration
 THINGSBOARD_BASE_URL = "https://webapp02.heatmanager.cloud"
-THINGSBOARD_USERNAME = os.getenv('THINGBOARD_USERNAME')
-THINGSBOARD_PASSWORD = os.getenv('THINGBOARD_PASSWORD')
-
-# Entferne Whitespace falls vorhanden (häufiges Problem bei .env Dateien)
-if THINGSBOARD_USERNAME:
-    THINGSBOARD_USERNAME = THINGSBOARD_USERNAME.strip()
-if THINGSBOARD_PASSWORD:
-    THINGSBOARD_PASSWORD = THINGSBOARD_PASSWORD.strip()
 
 # Melita.io Konfiguration
 MELITA_BASE_URL = "https://www.melita.io"
-MELITA_API_KEY = os.getenv('MELITA_API_KEY')
 
-# Agility Thingspark Konfiguration
-AGILITY_URL = os.getenv('AGILITY_URL')
+# Konfigurationswerte aus der .env Datei: Modul-Attribut -> Umgebungsvariable
+# Die Werte werden erst beim ersten Zugriff geladen (siehe __getattr__)
+_ENV_KEYS = {
+    'THINGSBOARD_USERNAME': 'THINGBOARD_USERNAME',
+    'THINGSBOARD_PASSWORD': 'THINGBOARD_PASSWORD',
+    'MELITA_API_KEY': 'MELITA_API_KEY',
+    'AGILITY_URL': 'AGILITY_URL',
+    'AGILITY_BATCH_URL': 'AGILITY_BATCH_URL',
+    'DB_SERVER': 'MSSQL_SERVER',
+    'DB_DATABASE': 'MSSQL_DATABASE',
+    'DB_USERNAME': 'MSSQL_USER',
+    'DB_PASSWORD': 'MSSQL_PASSWORD',
+}
+
+
+def _clean(name, default=None):
+    """
+    Liest eine Umgebungsvariable und entfernt umgebenden Whitespace
+    (häufiges Problem bei .env Dateien)
+    
+    Whitespace innerhalb des Werts bleibt erhalten, z.B. in Passwörtern.
+    """
+    value = os.getenv(name, default)
+    return value.strip() if value else value
+
+
+@lru_cache(maxsize=1)
+def _load_env():
+    """
+    Lädt die .env Datei einmalig und liefert die Konfigurationswerte
+    
+    Returns:
+        MappingProxyType: Schreibgeschützte Zuordnung Modul-Attribut -> Wert
+    """
+    # .env Datei laden - versuche zuerst im Projektroot, dann im aktuellen Verzeichnis
+    env_path = project_root / '.env'
+    if not env_path.exists():
+        env_path = current_dir / '.env'
+    if not env_path.exists():
+        env_path = Path('.env')  # Fallback: aktuelles Arbeitsverzeichnis
+    
+    load_dotenv(dotenv_path=env_path)
+    
+    return types.MappingProxyType({name: _clean(env_name) for name, env_name in _ENV_KEYS.items()})
+
+
+def __getattr__(name):
+    """Liefert Konfigurationswerte aus der .env Datei beim ersten Zugriff (PEP 562)"""
+    if name in _ENV_KEYS:
+        return _load_env()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_ENV_KEYS))
 
-# Database Konfiguration
-DB_SERVER = os.getenv('MSSQL_SERVER')
-DB_DATABASE = os.getenv('MSSQL_DATABASE')
-DB_USERNAME = os.getenv('MSSQL_USER')
-DB_PASSWORD = os.getenv('MSSQL_PASSWORD')
 
 # HTTP Konfiguration
 REQUEST_TIMEOUT = 30
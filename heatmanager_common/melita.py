@@ -7,223 +7,242 @@ Kann von allen Python-Skripten genutzt werden für:
 - API-Aufrufe
 - Queue-Nachrichten
 - Device-Queue-Verwaltung
+
+Der Zustand (Session, Token, Circuit Breaker, Caches) liegt in einem MelitaClient.
+Die Modulfunktionen nutzen einen Standard-Client mit MELITA_API_KEY aus .env;
+für weitere Zugangsdaten (z.B. pro Tenant) eigene MelitaClient-Instanzen anlegen.
 """
 
 import os
+import sys
 import json
+import atexit
+import logging
+import logging.handlers
+import queue
+import random
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
 import base64
+import functools
+import struct
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
 
+from .config import LOG_LEVEL, MELITA_ENDPOINTS
+from .ratelimit import TokenBucket
+
+# orjson (optional, pip install orjson) ist beim Parsen der Device-Listen deutlich schneller
+try:
+    import orjson
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:
+    _json_loads = json.loads
+    
+    def _json_dumps(obj):
+        return json.dumps(obj).encode('utf-8')
+
 # .env Datei laden
 load_dotenv()
 
+log = logging.getLogger(__name__)
+
+
+class _StderrFallbackHandler(logging.StreamHandler):
+    """
+    Gibt Warnungen und Fehler auf stderr aus, solange das Skript kein Logging eingerichtet hat
+
+    Sobald der Root-Logger Handler hat oder setup_melita_logging() aufgerufen wurde,
+    übernimmt deren Ausgabe und dieser Handler bleibt still.
+    """
+
+    def emit(self, record):
+        if logging.getLogger().handlers or any(handler is not self for handler in log.handlers):
+            return
+        super().emit(record)
+
+
+_fallback_handler = _StderrFallbackHandler(sys.stderr)
+_fallback_handler.setLevel(logging.WARNING)
+_fallback_handler.setFormatter(logging.Formatter("%(message)s"))
+log.addHandler(_fallback_handler)
+
+def _melita_log_level():
+    """
+    Level für den Melita.io Logger aus MELITA_LOG_LEVEL in .env
+    (Standard: LOG_LEVEL aus config, DEBUG zeigt Payload-Details)
+    
+    Ein ungültiger Wert führt nicht zu einem Fehler beim Import, sondern zu LOG_LEVEL.
+    """
+    level = (os.getenv('MELITA_LOG_LEVEL') or LOG_LEVEL).strip().upper()
+    if isinstance(logging.getLevelName(level), int):
+        return level
+    print(f"⚠️  Ungültiges MELITA_LOG_LEVEL '{level}' - verwende {LOG_LEVEL}", file=sys.stderr)
+    return LOG_LEVEL
+
+log.setLevel(_melita_log_level())
+
+def setup_melita_logging(stream=None):
+    """
+    Gibt die Melita.io Meldungen auf stream (Standard: stdout) aus
+    
+    Optional für Skripte ohne eigene Logging-Konfiguration. Die Meldungen gehen über
+    eine Queue an einen eigenen Listener-Thread - parallele Sende-Threads warten so
+    nicht auf die Konsole. Die Meldungen werden nicht zusätzlich an den Root-Logger
+    weitergegeben. Mehrfache Aufrufe richten die Ausgabe nur einmal ein.
+    """
+    if any(isinstance(handler, logging.handlers.QueueHandler) for handler in log.handlers):
+        return
+    
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(stream or sys.stdout)
+    stream_handler.setFormatter(logging.Formatter("%(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    
+    log.addHandler(logging.handlers.QueueHandler(log_queue))
+    log.propagate = False
+
 # Melita.io Konfiguration
 MELITA_BASE_URL = "https://www.melita.io"
 MELITA_API_KEY = os.getenv('MELITA_API_KEY')
 
-# Globaler Melita Bearer Token
-melita_bearer_token = None
+# Feste Header für alle API-Aufrufe (nach Token-Erneuerung wird nur Authorization gesetzt)
+_BASE_HEADERS = {
+    "Content-Type": "application/json",
+    "accept": "application/json"
+}
 
-def check_melita_connection():
-    """Testet die Verbindung zu Melita.io"""
-    if not MELITA_API_KEY:
-        print("❌ MELITA_API_KEY nicht in .env gesetzt")
-        return False
-    
-    try:
-        # Einfacher GET-Request zum Testen der Verbindung
-        response = requests.get(f"{MELITA_BASE_URL}/api/iot-gateway/auth/generate", 
-                              headers={"ApiKey": MELITA_API_KEY}, timeout=10)
-        print(f"✅ Melita.io Verbindung erfolgreich - Status: {response.status_code}")
-        return True
-    except requests.exceptions.ConnectionError as e:
-        print(f"❌ Verbindungsfehler zu Melita.io: {e}")
-        return False
-    except requests.exceptions.Timeout as e:
-        print(f"❌ Timeout-Fehler bei Melita.io: {e}")
-        return False
-    except Exception as e:
-        print(f"❌ Unbekannter Verbindungsfehler zu Melita.io: {e}")
-        return False
+# Sicherheitsabstand in Sekunden, ab dem ein Token vor Ablauf erneuert wird
+TOKEN_EXPIRY_MARGIN = 60
 
-def generate_melita_bearer_token():
-    """Generiert einen Bearer Token für Melita.io über den Auth-Endpunkt"""
-    global melita_bearer_token
+# Timeout in Sekunden für den Verbindungstest (check_melita_connection)
+MELITA_PROBE_TIMEOUT = 2
+
+# Anzahl Devices, die send_temperature_to_all_vicki_devices gleichzeitig bearbeitet
+MELITA_CONCURRENCY = 16
+
+# Rate Limit für Melita.io Requests pro Client: im Mittel MELITA_RATE_LIMIT Requests/Sekunde,
+# kurzfristig bis zu MELITA_RATE_BURST auf einmal (None = kein Limit)
+MELITA_RATE_LIMIT = 5.0
+MELITA_RATE_BURST = 10
+
+# Wiederholungen bei 429/5xx und Verbindungsfehlern (403 wird über Token-Erneuerung behandelt)
+MELITA_RETRIES = 3
+MELITA_RETRY_BACKOFF = 1.0
+MELITA_RETRY_MAX_DELAY = 30
+
+class _MelitaRetry(Retry):
+    """Retry mit Jitter auf dem exponentiellen Backoff und begrenzter Wartezeit, auch bei Retry-After"""
     
-    if not MELITA_API_KEY:
-        print("❌ MELITA_API_KEY nicht in .env gesetzt")
-        return None
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        # Jitter: Wartezeit zufällig zwischen 50% und 100% des Backoffs
+        return min(MELITA_RETRY_MAX_DELAY, backoff / 2 + random.uniform(0, backoff / 2))
     
-    try:
-        print(f"🔑 Generiere Melita.io Bearer Token...")
-        
-        # Melita Auth-Endpunkt
-        auth_url = f"{MELITA_BASE_URL}/api/iot-gateway/auth/generate"
-        headers = {"ApiKey": MELITA_API_KEY}
-        
-        response = requests.post(auth_url, headers=headers, timeout=30)
-        
-        if response.status_code == 200:
-            try:
-                data = response.json()
-                if 'authToken' in data:
-                    melita_bearer_token = data['authToken']
-                    print(f"✅ Melita.io Bearer Token erfolgreich generiert")
-                    print(f"   Token: {melita_bearer_token[:20]}...{melita_bearer_token[-20:]}")
-                    
-                    if 'expiry' in data:
-                        expiry_timestamp = data['expiry']
-                        expiry_date = datetime.fromtimestamp(expiry_timestamp).strftime('%Y-%m-%d %H:%M:%S')
-                        print(f"   ⏰ Token läuft ab: {expiry_date}")
-                    
-                    return melita_bearer_token
-                else:
-                    print(f"⚠️  Token nicht in der API-Antwort gefunden")
-                    print(f"   Verfügbare Schlüssel: {list(data.keys())}")
-                    return None
-            except json.JSONDecodeError as e:
-                print(f"❌ Fehler beim Parsen der JSON-Antwort: {e}")
-                return None
-        else:
-            print(f"❌ HTTP-Fehler {response.status_code}: {response.text}")
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
             return None
-            
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Fehler beim Generieren des Melita.io Bearer Tokens: {e}")
-        return None
+        return min(MELITA_RETRY_MAX_DELAY, retry_after)
 
-def get_melita_headers():
-    """Gibt die HTTP-Header mit dem aktuellen Melita.io Bearer Token zurück"""
-    global melita_bearer_token
-    
-    if not melita_bearer_token:
-        print("❌ Kein Melita.io Bearer Token verfügbar!")
-        return None
-    
-    return {
-        "Authorization": f"Bearer {melita_bearer_token}",
-        "Content-Type": "application/json",
-        "accept": "application/json"
-    }
+# Circuit Breaker: nach BREAKER_THRESHOLD aufeinanderfolgenden Fehlern (Verbindungsfehler
+# oder 5xx) werden Melita.io Aufrufe für BREAKER_RESET_AFTER Sekunden sofort abgelehnt
+BREAKER_THRESHOLD = 5
+BREAKER_RESET_AFTER = 60
 
-def refresh_melita_token_if_needed():
-    """Erneuert den Token falls er abgelaufen ist oder fehlt"""
-    global melita_bearer_token
-    
-    if not melita_bearer_token:
-        return generate_melita_bearer_token()
-    
-    # Hier könnte man eine Token-Validitätsprüfung hinzufügen
-    # Für jetzt: Token erneuern wenn er fehlt
-    return melita_bearer_token
+def circuit_break(failure_value):
+    """
+    Decorator für MelitaClient-Methoden: Gibt bei offenem Circuit Breaker sofort
+    failure_value zurück, ohne Melita.io aufzurufen
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if self.is_circuit_open():
+                remaining = int(self._breaker["open_until"] - time.time()) + 1
+                log.warning("⛔ Melita.io Circuit Breaker offen - überspringe %s (noch %ss)", func.__name__, remaining)
+                return failure_value
+            return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
 
-def flush_melita_device_queue(device_eui):
-    """Leert die Queue eines Melita.io Devices vor dem Senden neuer Nachrichten"""
-    global melita_bearer_token
-    
-    if not melita_bearer_token:
-        print("❌ Kein Melita.io Bearer Token verfügbar")
-        return False
-    
-    headers = get_melita_headers()
-    url = f"{MELITA_BASE_URL}/api/iot-gateway/lorawan/{device_eui}/queue"
+# Kurzzeit-Cache für Listenabfragen (Contracts/Devices), die innerhalb eines Laufs mehrfach kommen
+MELITA_CACHE_TTL = 60
+MELITA_CACHE_MAXSIZE = 64
+
+def ttl_cache(ttl=MELITA_CACHE_TTL, maxsize=MELITA_CACHE_MAXSIZE):
+    """
+    Decorator für MelitaClient-Methoden: Merkt sich Ergebnisse pro Argumentkombination
+    für ttl Sekunden
     
-    try:
-        print(f"🧹 Leere Queue für Device {device_eui}...")
-        response = requests.delete(url, headers=headers, timeout=30)
-        
-        if response.status_code == 200:
-            print(f"✅ Queue erfolgreich geleert für {device_eui}")
-            return True
-        elif response.status_code == 204:
-            print(f"✅ Queue erfolgreich geleert für {device_eui} (keine Inhalte)")
-            return True
-        elif response.status_code == 403:
-            print(f"⚠️  Token abgelaufen (403) - Versuche Token zu erneuern...")
-            # Token erneuern und erneut versuchen
-            if generate_melita_bearer_token():
-                print(f"🔄 Token erneuert - Versuche Queue-Leerung erneut...")
-                headers = get_melita_headers()
-                response = requests.delete(url, headers=headers, timeout=30)
-                if response.status_code in [200, 204]:
-                    print(f"✅ Queue erfolgreich geleert für {device_eui} (nach Token-Erneuerung)")
-                    return True
-                else:
-                    print(f"❌ Fehler beim erneuten Versuch: {response.status_code}")
-                    return False
-            else:
-                print(f"❌ Token-Erneuerung fehlgeschlagen")
-                return False
-        else:
-            print(f"❌ Fehler beim Leeren der Queue: {response.status_code}")
-            print(f"   Response: {response.text}")
-            return False
+    Der Cache liegt am Client (self._cache, je Methode höchstens maxsize Einträge), jeder
+    Client hat also seinen eigenen Cache und hält keine anderen Clients am Leben.
+    None (Fehler) wird nicht gecacht. Das gecachte Objekt wird direkt zurückgegeben,
+    Aufrufer sollten es daher nicht verändern. Leeren mit client.cache_clear().
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            now = time.monotonic()
+            with self._cache_lock:
+                entry = self._cache.get(func.__name__, {}).get(key)
+            if entry and entry[0] > now:
+                return entry[1]
             
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Fehler beim Leeren der Queue: {e}")
-        return False
+            result = func(self, *args, **kwargs)
+            if result is not None:
+                with self._cache_lock:
+                    # Erst hier holen: ein cache_clear() während des Aufrufs ersetzt das Dict
+                    cache = self._cache.setdefault(func.__name__, {})
+                    if key not in cache and len(cache) >= maxsize:
+                        # Abgelaufene Einträge entfernen, sonst den ältesten
+                        for expired in [k for k, (expires, _) in cache.items() if expires <= now]:
+                            del cache[expired]
+                        if len(cache) >= maxsize:
+                            del cache[next(iter(cache))]
+                    cache[key] = (now + ttl, result)
+            return result
+        
+        return wrapper
+    return decorator
 
-def send_melita_queue_message(device_eui, data="FRg=", fport=2, confirmed=False):
-    """Sendet eine Queue-Nachricht an ein Melita.io Device"""
-    global melita_bearer_token
-    
-    if not melita_bearer_token:
-        print("❌ Kein Melita.io Bearer Token verfügbar")
-        return False
-    
-    # Zuerst die Queue leeren (gemäß Melita.io API-Dokumentation)
-    if not flush_melita_device_queue(device_eui):
-        print(f"⚠️  Queue konnte nicht geleert werden - überspringe Device {device_eui}")
-        return False
-    
-    # Kurze Pause nach dem Leeren der Queue
-    time.sleep(1)
-    
-    headers = get_melita_headers()
-    url = f"{MELITA_BASE_URL}/api/iot-gateway/lorawan/{device_eui}/queue"
+class _MelitaSession(requests.Session):
+    """
+    Session für Melita.io (die Aufrufer übergeben vollständige URLs, siehe MelitaClient):
+    - jedes Ergebnis (Verbindungsfehler/5xx vs. Antwort) wird an record_result gemeldet (Circuit Breaker)
+    - vor jedem Request wird ein Token aus rate_limiter genommen (falls gesetzt)
+    """
     
-    # Queue-Nachricht mit den spezifizierten Parametern
-    queue_data = {
-        "confirmed": confirmed,
-        "data": data,
-        "devEUI": device_eui,
-        "fPort": fport
-    }
+    def __init__(self, record_result, rate_limiter=None):
+        super().__init__()
+        self.record_result = record_result
+        self.rate_limiter = rate_limiter
     
-    try:
-        print(f"📤 Sende Queue-Nachricht an Device {device_eui}...")
-        response = requests.post(url, headers=headers, json=queue_data, timeout=30)
-        
-        if response.status_code == 200:
-            print(f"✅ Queue-Nachricht erfolgreich gesendet an {device_eui}")
-            return True
-        elif response.status_code == 403:
-            print(f"⚠️  Token abgelaufen (403) - Versuche Token zu erneuern...")
-            # Token erneuern und erneut versuchen
-            if generate_melita_bearer_token():
-                print(f"🔄 Token erneuert - Versuche erneut...")
-                headers = get_melita_headers()
-                response = requests.post(url, headers=headers, json=queue_data, timeout=30)
-                if response.status_code == 200:
-                    print(f"✅ Queue-Nachricht erfolgreich gesendet an {device_eui} (nach Token-Erneuerung)")
-                    return True
-                else:
-                    print(f"❌ Fehler beim erneuten Versuch: {response.status_code}")
-                    return False
-            else:
-                print(f"❌ Token-Erneuerung fehlgeschlagen")
-                return False
-        else:
-            print(f"❌ Fehler beim Senden der Queue-Nachricht: {response.status_code}")
-            print(f"   Response: {response.text}")
-            return False
-            
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Fehler beim Senden der Queue-Nachricht: {e}")
-        return False
+    def request(self, method, url, *args, **kwargs):
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except requests.exceptions.RequestException:
+            self.record_result(False)
+            raise
+        self.record_result(response.status_code < 500)
+        return response
+
+def _is_queue_full_response(response):
+    """Prüft ob Melita.io die Queue-Nachricht wegen einer vollen/belegten Queue abgelehnt hat"""
+    if response.status_code == 409:
+        return True
+    return response.status_code == 400 and 'queue' in response.text.lower()
 
 def create_temperature_hex_payload(min_temp, max_temp, operational_mode=None):
     """
@@ -237,33 +256,33 @@ def create_temperature_hex_payload(min_temp, max_temp, operational_mode=None):
         
         # Prüfe ob Temperaturen im gültigen Bereich liegen (0-255°C)
         if min_temp_int < 0 or min_temp_int > 255:
-            print(f"⚠️  minTemp {min_temp_int}°C außerhalb des gültigen Bereichs (0-255°C)")
+            log.warning("⚠️  minTemp %s°C außerhalb des gültigen Bereichs (0-255°C)", min_temp_int)
             return None
         if max_temp_int < 0 or max_temp_int > 255:
-            print(f"⚠️  maxTemp {max_temp_int}°C außerhalb des gültigen Bereichs (0-255°C)")
+            log.warning("⚠️  maxTemp %s°C außerhalb des gültigen Bereichs (0-255°C)", max_temp_int)
             return None
         
         # Operational Mode bestimmen
         if operational_mode in [2, 10]:
             op_mode_hex = "02"
-            print(f"   🔧 Operational Mode: {operational_mode} → 02 (aktiviert)")
+            log.debug("   🔧 Operational Mode: %s → 02 (aktiviert)", operational_mode)
         else:
             op_mode_hex = "00"
-            print(f"   🔧 Operational Mode: {operational_mode} → 00 (deaktiviert)")
+            log.debug("   🔧 Operational Mode: %s → 00 (deaktiviert)", operational_mode)
         
         # Hex-String erstellen: 08 + minTemp (1 Byte) + maxTemp (1 Byte) + operationalMode (2 Bytes) + 15 + 18
         hex_payload = f"08{min_temp_int:02x}{max_temp_int:02x}0d{op_mode_hex}1518"
         
-        print(f"🌡️  Temperatur-Payload erstellt:")
-        print(f"   minTemp: {min_temp_int}°C -> {min_temp_int:02x}")
-        print(f"   maxTemp: {max_temp_int}°C -> {max_temp_int:02x}")
-        print(f"   Hex-Payload: {hex_payload} (7 Bytes)")
-        print(f"   Zusätzliche Hex-Werte: 15 + 18")
+        log.debug("🌡️  Temperatur-Payload erstellt:")
+        log.debug("   minTemp: %s°C -> %02x", min_temp_int, min_temp_int)
+        log.debug("   maxTemp: %s°C -> %02x", max_temp_int, max_temp_int)
+        log.debug("   Hex-Payload: %s (7 Bytes)", hex_payload)
+        log.debug("   Zusätzliche Hex-Werte: 15 + 18")
         
         return hex_payload
-        
+    
     except (ValueError, TypeError) as e:
-        print(f"❌ Fehler beim Erstellen des Temperatur-Payloads: {e}")
+        log.error("❌ Fehler beim Erstellen des Temperatur-Payloads: %s", e)
         return None
 
 def hex_to_base64(hex_string):
@@ -274,201 +293,727 @@ def hex_to_base64(hex_string):
         # Bytes zu Base64
         base64_string = base64.b64encode(hex_bytes).decode('utf-8')
         
-        print(f"🔄 Hex zu Base64 konvertiert:")
-        print(f"   Hex: {hex_string}")
-        print(f"   Base64: {base64_string}")
+        log.debug("🔄 Hex zu Base64 konvertiert:")
+        log.debug("   Hex: %s", hex_string)
+        log.debug("   Base64: %s", base64_string)
         
         return base64_string
-        
+    
     except Exception as e:
-        print(f"❌ Fehler bei der Base64-Konvertierung: {e}")
+        log.error("❌ Fehler bei der Base64-Konvertierung: %s", e)
         return None
 
-def send_temperature_to_vicki_device(device_eui, min_temp, max_temp, operational_mode=None, fport=2):
+# 7-Byte vicki-Payload: 08 + minTemp + maxTemp + 0d + operationalMode + 15 + 18
+_VICKI_PAYLOAD = struct.Struct(">7B")
+
+def build_vicki_payload(min_temp, max_temp, operational_mode=None):
     """
-    Sendet Temperaturdaten an ein vicki-Device
-    - Erstellt Hex-Payload: 08 + minTemp + maxTemp + operationalMode
-    - Konvertiert zu Base64
-    - Sendet an Melita.io
+    Erstellt den Base64-Payload für Temperaturdaten eines vicki-Devices in einem Schritt
+    Format: 08 + minTemp (1 Byte) + maxTemp (1 Byte) + 0d + operationalMode (1 Byte) + 15 + 18
+    
+    Die 7 Bytes werden direkt mit struct.pack gebaut (ohne Umweg über einen Hex-String);
+    Werte außerhalb von 0-255 lösen dabei struct.error aus.
+    
+    Returns:
+        str: Base64-Payload oder None bei ungültigen Werten
     """
-    print(f"🌡️  Sende Temperaturdaten an vicki-Device {device_eui}")
-    print(f"   minTemp: {min_temp}°C, maxTemp: {max_temp}°C")
-    if operational_mode is not None:
-        print(f"   Operational Mode: {operational_mode}")
-    
-    # Hex-Payload erstellen
-    hex_payload = create_temperature_hex_payload(min_temp, max_temp, operational_mode)
-    if not hex_payload:
-        print(f"❌ Konnte Hex-Payload nicht erstellen für Device {device_eui}")
-        return False
-    
-    # Hex zu Base64 konvertieren
-    base64_payload = hex_to_base64(hex_payload)
-    if not base64_payload:
-        print(f"❌ Konnte Base64-Payload nicht erstellen für Device {device_eui}")
-        return False
-    
-    # Nachricht an Melita.io senden
-    success = send_melita_queue_message(device_eui, data=base64_payload, fport=fport)
-    
-    if success:
-        print(f"✅ Temperaturdaten erfolgreich an {device_eui} gesendet")
-        print(f"   Payload: {base64_payload}")
-    else:
-        print(f"❌ Fehler beim Senden der Temperaturdaten an {device_eui}")
-    
-    return success
-
-def send_temperature_to_all_vicki_devices(devices_data, fport=2):
+    try:
+        op_mode_byte = 0x02 if operational_mode in (2, 10) else 0x00
+        payload = _VICKI_PAYLOAD.pack(0x08, int(min_temp), int(max_temp), 0x0d, op_mode_byte, 0x15, 0x18)
+        return base64.b64encode(payload).decode('ascii')
+    except (ValueError, TypeError, struct.error) as e:
+        log.warning("⚠️  Ungültige Temperaturwerte minTemp=%s, maxTemp=%s (gültig: 0-255°C): %s", min_temp, max_temp, e)
+        return None
+
+def build_vicki_payloads_bulk(min_temps, max_temps, modes=None):
     """
-    Sendet Temperaturdaten an alle vicki-Devices
-    devices_data: Liste von Dictionaries mit device_eui, min_temp, max_temp, operational_mode (optional)
+    Erstellt die Base64-Payloads für viele vicki-Devices auf einmal
+    
+    min_temps, max_temps, modes: gleich lange Sequenzen (modes optional, None = alle deaktiviert)
+    
+    Anders als build_vicki_payload wird nicht pro Device geloggt und ein ungültiger
+    Wert bricht den ganzen Aufruf ab.
+    
+    Returns:
+        list: Base64-Payloads in der Reihenfolge der Eingaben
+    
+    Raises:
+        ValueError: bei unterschiedlich langen Eingaben oder Werten außerhalb von 0-255
     """
-    if not devices_data:
-        print("⚠️  Keine Devices-Daten übergeben")
-        return False
+    if modes is None:
+        modes = [None] * len(min_temps)
+    if not len(min_temps) == len(max_temps) == len(modes):
+        raise ValueError("min_temps, max_temps und modes müssen gleich lang sein")
     
-    print(f"🚀 Starte Temperatur-Synchronisation für {len(devices_data)} vicki-Devices")
+    pack = _VICKI_PAYLOAD.pack
+    b64encode = base64.b64encode
+    try:
+        return [
+            b64encode(pack(0x08, int(lo), int(hi), 0x0d, 0x02 if mode in (2, 10) else 0x00, 0x15, 0x18)).decode('ascii')
+            for lo, hi, mode in zip(min_temps, max_temps, modes)
+        ]
+    except (TypeError, struct.error) as e:
+        raise ValueError(f"Ungültige Temperaturwerte (gültig: 0-255°C): {e}") from e
+
+# Seitengröße beim Abrufen der Devices (Melita.io liefert die Devices seitenweise)
+MELITA_DEVICES_PAGE_SIZE = 200
+
+class MelitaClient:
+    """
+    Melita.io Client mit eigenem Zustand:
+    - HTTP-Session (Keep-Alive, Retry-Adapter)
+    - Bearer Token und Ablaufzeitpunkt
+    - Circuit Breaker
+    - Rate Limiter (Token-Bucket, rate Requests/Sekunde, burst auf einmal; rate=None = kein Limit)
+    - Kurzzeit-Cache für Contracts/Devices
+    
+    Alle Methoden sind threadsicher; mehrere Clients (z.B. ein API-Key pro Tenant)
+    beeinflussen sich gegenseitig nicht.
+    """
     
-    # Melita.io Token generieren
-    if not generate_melita_bearer_token():
-        print("❌ Konnte Melita.io Token nicht generieren")
-        return False
+    def __init__(self, api_key, base_url=MELITA_BASE_URL, concurrency=MELITA_CONCURRENCY,
+                 rate=MELITA_RATE_LIMIT, burst=MELITA_RATE_BURST):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.concurrency = concurrency
+        
+        # Token-Cache: Bearer Token und Ablaufzeitpunkt (Unix-Sekunden, None = unbekannt)
+        self._token = None
+        self._expiry = None
+        # Sperre für die Token-Erneuerung (nur ein Auth-Request gleichzeitig)
+        self._lock = threading.Lock()
+        
+        self._breaker = {"failures": 0, "open_until": 0.0}
+        self._breaker_lock = threading.Lock()
+        
+        # Kurzzeit-Cache für Contracts/Devices: Methodenname -> {Argumente: (Ablaufzeit, Ergebnis)}
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        
+        # Gemeinsame HTTP-Session für alle Aufrufe (Keep-Alive statt neuer TCP/TLS-Verbindung pro Request).
+        # pool_block: mehr parallele Requests als Verbindungen im Pool warten auf eine freie Verbindung,
+        # statt zusätzliche Verbindungen aufzubauen und nach dem Request wieder zu verwerfen
+        self._bucket = TokenBucket(rate, burst) if rate else None
+        self._session = _MelitaSession(self._breaker_record, self._bucket)
+        self._session.mount("https://", HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=concurrency,
+            pool_block=True,
+            max_retries=_MelitaRetry(
+                total=MELITA_RETRIES,
+                backoff_factor=MELITA_RETRY_BACKOFF,
+                status_forcelist=[429, 502, 503, 504],
+                allowed_methods=frozenset(["GET", "POST", "DELETE"]),
+                respect_retry_after_header=True,
+                raise_on_status=False
+            )
+        ))
+        self._session.headers["Connection"] = "keep-alive"
+        self._session.headers.update(_BASE_HEADERS)
+        
+        # Eigene Session für den Verbindungstest ohne Wiederholungen, damit
+        # MELITA_PROBE_TIMEOUT die gesamte Wartezeit begrenzt (siehe check_connection)
+        self._probe_session = requests.Session()
+        self._probe_session.mount("https://", HTTPAdapter(max_retries=0))
+        self._probe_session.mount("http://", HTTPAdapter(max_retries=0))
+        
+        # Endpunkt-URLs einmalig vorberechnen (Queue-URL als Template pro Device)
+        self._auth_url = base_url + MELITA_ENDPOINTS['auth']
+        self._contracts_url = base_url + MELITA_ENDPOINTS['contracts']
+        self._devices_url = base_url + MELITA_ENDPOINTS['devices']
+        self._queue_url_tmpl = base_url + MELITA_ENDPOINTS['device_queue'].replace('{device_eui}', '{}')
+    
+    # Circuit Breaker
+    
+    def _breaker_record(self, success):
+        """Zählt aufeinanderfolgende Fehler und öffnet den Circuit Breaker beim Schwellwert"""
+        with self._breaker_lock:
+            if success:
+                self._breaker["failures"] = 0
+                return
+            
+            self._breaker["failures"] += 1
+            if self._breaker["failures"] >= BREAKER_THRESHOLD:
+                self._breaker["open_until"] = time.time() + BREAKER_RESET_AFTER
+                self._breaker["failures"] = 0
+                log.warning("⛔ Melita.io Circuit Breaker geöffnet - Aufrufe für %ss ausgesetzt", BREAKER_RESET_AFTER)
     
-    success_count = 0
-    error_count = 0
+    def is_circuit_open(self):
+        """Prüft ob der Circuit Breaker offen ist (Melita.io gilt vorübergehend als nicht erreichbar)"""
+        return time.time() < self._breaker["open_until"]
     
-    for i, device in enumerate(devices_data, 1):
-        device_eui = device.get('device_eui')
-        min_temp = device.get('min_temp')
-        max_temp = device.get('max_temp')
-        operational_mode = device.get('operational_mode')  # Optional
+    # Verbindung & Authentifizierung
+    
+    def check_connection(self):
+        """
+        Testet die Verbindung zu Melita.io
         
-        if not all([device_eui, min_temp is not None, max_temp is not None]):
-            print(f"⚠️  Unvollständige Daten für Device {i}: {device}")
-            error_count += 1
-            continue
+        HEAD-Request ohne Body und ohne Authentifizierung (kein Token wird verbraucht),
+        genau ein Versuch über _probe_session (ohne Retry-Adapter und Rate Limiter).
+        Jede Antwort unter 500 gilt als erreichbar - auch 4xx, der Server lehnt dann
+        nur den Request ab.
+        """
+        if not self.api_key:
+            log.error("❌ MELITA_API_KEY nicht in .env gesetzt")
+            return False
         
-        print(f"\n📱 Device {i}/{len(devices_data)}: {device_eui}")
+        try:
+            response = self._probe_session.head(self._auth_url, timeout=MELITA_PROBE_TIMEOUT)
+            if response.status_code >= 500:
+                log.error("❌ Melita.io nicht verfügbar - Status: %s", response.status_code)
+                return False
+            log.info("✅ Melita.io Verbindung erfolgreich - Status: %s", response.status_code)
+            return True
+        except requests.exceptions.ConnectionError as e:
+            log.error("❌ Verbindungsfehler zu Melita.io: %s", e)
+            return False
+        except requests.exceptions.Timeout as e:
+            log.error("❌ Timeout-Fehler bei Melita.io: %s", e)
+            return False
+        except Exception as e:
+            log.error("❌ Unbekannter Verbindungsfehler zu Melita.io: %s", e)
+            return False
+    
+    @circuit_break(None)
+    def generate_bearer_token(self):
+        """Generiert einen Bearer Token für Melita.io über den Auth-Endpunkt"""
+        if not self.api_key:
+            log.error("❌ MELITA_API_KEY nicht in .env gesetzt")
+            return None
         
         try:
-            if send_temperature_to_vicki_device(device_eui, min_temp, max_temp, operational_mode, fport):
-                success_count += 1
+            log.info("🔑 Generiere Melita.io Bearer Token...")
+            
+            response = self._session.post(self._auth_url, headers={"ApiKey": self.api_key}, timeout=30)
+            
+            if response.status_code == 200:
+                try:
+                    data = _json_loads(response.content)
+                    if 'authToken' in data:
+                        token = data['authToken']
+                        self._token = token
+                        self._expiry = data.get('expiry')
+                        self._session.headers["Authorization"] = f"Bearer {token}"
+                        log.info("✅ Melita.io Bearer Token erfolgreich generiert")
+                        log.info("   Token: %s...%s", token[:20], token[-20:])
+                        
+                        if 'expiry' in data:
+                            expiry_timestamp = data['expiry']
+                            expiry_date = datetime.fromtimestamp(expiry_timestamp).strftime('%Y-%m-%d %H:%M:%S')
+                            log.info("   ⏰ Token läuft ab: %s", expiry_date)
+                        
+                        return token
+                    else:
+                        log.warning("⚠️  Token nicht in der API-Antwort gefunden")
+                        log.warning("   Verfügbare Schlüssel: %s", list(data.keys()))
+                        return None
+                except ValueError as e:
+                    log.error("❌ Fehler beim Parsen der JSON-Antwort: %s", e)
+                    return None
             else:
-                error_count += 1
-        except Exception as e:
-            print(f"❌ Unerwarteter Fehler bei Device {device_eui}: {e}")
-            error_count += 1
+                log.error("❌ HTTP-Fehler %s: %s", response.status_code, response.text)
+                return None
         
-        # Kurze Pause zwischen den Devices
-        if i < len(devices_data):
-            time.sleep(2)
-    
-    print(f"\n🎯 Temperatur-Synchronisation abgeschlossen:")
-    print(f"   ✅ Erfolgreich: {success_count}")
-    print(f"   ❌ Fehler: {error_count}")
-    print(f"   📊 Gesamt: {len(devices_data)}")
-    
-    return success_count > 0
-
-def get_melita_devices(contract_id=None):
-    """Holt alle verfügbaren Devices von Melita.io"""
-    global melita_bearer_token
+        except requests.exceptions.RequestException as e:
+            log.error("❌ Fehler beim Generieren des Melita.io Bearer Tokens: %s", e)
+            return None
     
-    if not melita_bearer_token:
-        print("❌ Kein Melita.io Bearer Token verfügbar")
-        return None
+    def headers(self):
+        """Gibt die HTTP-Header mit dem aktuellen Melita.io Bearer Token zurück"""
+        token = self._token
+        
+        if not token:
+            log.error("❌ Kein Melita.io Bearer Token verfügbar!")
+            return None
+        
+        return {"Authorization": f"Bearer {token}", **_BASE_HEADERS}
     
-    headers = get_melita_headers()
+    def is_token_valid(self):
+        """Prüft ob ein Token vorhanden ist, das nicht innerhalb von TOKEN_EXPIRY_MARGIN abläuft"""
+        if not self._token:
+            return False
+        
+        expiry = self._expiry
+        return expiry is None or time.time() < expiry - TOKEN_EXPIRY_MARGIN
     
-    if contract_id:
-        print(f"🔍 Hole alle Devices für Contract ID: {contract_id}")
-        url = f"{MELITA_BASE_URL}/api/iot-gateway/lorawan/devices"
-        params = {'contractId': contract_id, 'pageSize': 1000, 'page': 0}
-    else:
-        print(f"🔍 Hole alle verfügbaren Devices")
-        url = f"{MELITA_BASE_URL}/api/iot-gateway/lorawan/devices"
-        params = {'pageSize': 1000, 'page': 0}
+    def refresh_token_if_needed(self):
+        """Erneuert den Token falls er fehlt oder demnächst abläuft, sonst wird der gecachte Token genutzt"""
+        if self.is_token_valid():
+            return self._token
+        
+        # Single-Flight: bei parallelen Aufrufen erneuert nur ein Thread den Token,
+        # die übrigen warten und nutzen danach dessen Ergebnis
+        with self._lock:
+            if self.is_token_valid():
+                return self._token
+            return self.generate_bearer_token()
+    
+    def renew_token(self, rejected_token):
+        """
+        Erneuert den Token nach einer 403-Antwort
+        
+        Hat ein anderer Thread den abgelehnten Token bereits ersetzt, wird der neue
+        Token zurückgegeben statt einen weiteren anzufordern.
+        """
+        with self._lock:
+            token = self._token
+            if token and token != rejected_token:
+                return token
+            return self.generate_bearer_token()
+    
+    def is_connected(self):
+        """Prüft ob eine Verbindung zu Melita.io besteht"""
+        return self._token is not None
+    
+    def token_info(self):
+        """Gibt Informationen über den aktuellen Token zurück"""
+        token = self._token
+        if token:
+            return {
+                'has_token': True,
+                'token_preview': f"{token[:20]}...{token[-20:]}",
+                'expiry': self._expiry
+            }
+        else:
+            return {
+                'has_token': False,
+                'token_preview': None,
+                'expiry': None
+            }
+    
+    # Queue-Verwaltung
+    
+    @circuit_break(False)
+    def flush_device_queue(self, device_eui):
+        """Leert die Queue eines Melita.io Devices vor dem Senden neuer Nachrichten"""
+        token = self.refresh_token_if_needed()
+        if not token:
+            log.error("❌ Kein Melita.io Bearer Token verfügbar")
+            return False
+        
+        url = self._queue_url_tmpl.format(device_eui)
+        
+        try:
+            log.info("🧹 Leere Queue für Device %s...", device_eui)
+            response = self._session.delete(url, timeout=30)
+            
+            if response.status_code == 200:
+                log.info("✅ Queue erfolgreich geleert für %s", device_eui)
+                return True
+            elif response.status_code == 204:
+                log.info("✅ Queue erfolgreich geleert für %s (keine Inhalte)", device_eui)
+                return True
+            elif response.status_code == 403:
+                log.warning("⚠️  Token abgelaufen (403) - Versuche Token zu erneuern...")
+                # Token erneuern und erneut versuchen
+                if self.renew_token(token):
+                    log.info("🔄 Token erneuert - Versuche Queue-Leerung erneut...")
+                    response = self._session.delete(url, timeout=30)
+                    if response.status_code in [200, 204]:
+                        log.info("✅ Queue erfolgreich geleert für %s (nach Token-Erneuerung)", device_eui)
+                        return True
+                    else:
+                        log.error("❌ Fehler beim erneuten Versuch: %s", response.status_code)
+                        return False
+                else:
+                    log.error("❌ Token-Erneuerung fehlgeschlagen")
+                    return False
+            else:
+                log.error("❌ Fehler beim Leeren der Queue: %s", response.status_code)
+                log.error("   Response: %s", response.text)
+                return False
+        
+        except requests.exceptions.RequestException as e:
+            log.error("❌ Fehler beim Leeren der Queue: %s", e)
+            return False
     
-    try:
-        response = requests.get(url, headers=headers, params=params, timeout=30)
-        if response.status_code == 200:
-            data = response.json()
+    @circuit_break(False)
+    def send_queue_message(self, device_eui, data="FRg=", fport=2, confirmed=False, idempotency_key=None):
+        """
+        Sendet eine Queue-Nachricht an ein Melita.io Device
+        
+        Die Nachricht wird direkt gesendet. Nur wenn Melita.io sie wegen einer vollen
+        Queue ablehnt (409 bzw. 400 mit Queue-Fehler), wird die Queue geleert und
+        die Nachricht erneut gesendet.
+        
+        Alle Versuche dieser Nachricht (Retry, erneutes Senden nach Queue-Leerung oder
+        Token-Erneuerung) tragen denselben X-Idempotency-Key, damit ein Downlink nicht
+        doppelt eingereiht wird, wenn nur die Antwort verloren ging. Ohne idempotency_key
+        wird pro Aufruf ein neuer erzeugt; wer dieselbe Nachricht für ein Device aus
+        mehreren Aufrufen/Threads senden kann, sollte einen gemeinsamen Key übergeben.
+        """
+        token = self.refresh_token_if_needed()
+        if not token:
+            log.error("❌ Kein Melita.io Bearer Token verfügbar")
+            return False
+        
+        url = self._queue_url_tmpl.format(device_eui)
+        
+        # Queue-Nachricht mit den spezifizierten Parametern (einmal serialisiert, auch für Wiederholungen)
+        queue_data = {
+            "confirmed": confirmed,
+            "data": data,
+            "devEUI": device_eui,
+            "fPort": fport
+        }
+        body = _json_dumps(queue_data)
+        headers = {"X-Idempotency-Key": idempotency_key or uuid.uuid4().hex}
+        
+        try:
+            log.info("📤 Sende Queue-Nachricht an Device %s...", device_eui)
+            response = self._session.post(url, data=body, headers=headers, timeout=30)
             
-            # Verschiedene Response-Strukturen unterstützen
-            devices = None
-            if 'content' in data:
-                devices = data['content']
-            elif 'devices' in data:
-                devices = data['devices']
-            elif 'data' in data:
-                devices = data['data']
-            elif 'results' in data:
-                devices = data['results']
-            elif 'items' in data:
-                devices = data['items']
+            if _is_queue_full_response(response):
+                log.warning("⚠️  Queue belegt (%s) - leere Queue und sende erneut...", response.status_code)
+                if not self.flush_device_queue(device_eui):
+                    log.warning("⚠️  Queue konnte nicht geleert werden - überspringe Device %s", device_eui)
+                    return False
+                response = self._session.post(url, data=body, headers=headers, timeout=30)
             
-            if devices:
-                print(f"✅ {len(devices)} Devices erfolgreich geladen")
-                return devices
+            if response.status_code == 200:
+                log.info("✅ Queue-Nachricht erfolgreich gesendet an %s", device_eui)
+                return True
+            elif response.status_code == 403:
+                log.warning("⚠️  Token abgelaufen (403) - Versuche Token zu erneuern...")
+                # Token erneuern und erneut versuchen
+                if self.renew_token(token):
+                    log.info("🔄 Token erneuert - Versuche erneut...")
+                    response = self._session.post(url, data=body, headers=headers, timeout=30)
+                    if response.status_code == 200:
+                        log.info("✅ Queue-Nachricht erfolgreich gesendet an %s (nach Token-Erneuerung)", device_eui)
+                        return True
+                    else:
+                        log.error("❌ Fehler beim erneuten Versuch: %s", response.status_code)
+                        return False
+                else:
+                    log.error("❌ Token-Erneuerung fehlgeschlagen")
+                    return False
             else:
-                print("⚠️  Keine Devices in der Antwort gefunden")
-                return []
+                log.error("❌ Fehler beim Senden der Queue-Nachricht: %s", response.status_code)
+                log.error("   Response: %s", response.text)
+                return False
+        
+        except requests.exceptions.RequestException as e:
+            log.error("❌ Fehler beim Senden der Queue-Nachricht: %s", e)
+            return False
+    
+    # Temperatur-Synchronisation für vicki-Devices
+    
+    def send_temperature_to_vicki_device(self, device_eui, min_temp, max_temp, operational_mode=None, fport=2):
+        """
+        Sendet Temperaturdaten an ein vicki-Device
+        - Erstellt Payload: 08 + minTemp + maxTemp + 0d + operationalMode + 15 + 18 (Base64)
+        - Sendet an Melita.io
+        """
+        log.info("🌡️  Sende Temperaturdaten an vicki-Device %s", device_eui)
+        log.info("   minTemp: %s°C, maxTemp: %s°C", min_temp, max_temp)
+        if operational_mode is not None:
+            log.info("   Operational Mode: %s", operational_mode)
+        
+        # Base64-Payload direkt aus den Bytes erstellen
+        base64_payload = build_vicki_payload(min_temp, max_temp, operational_mode)
+        if not base64_payload:
+            log.error("❌ Konnte Payload nicht erstellen für Device %s", device_eui)
+            return False
+        
+        # Nachricht an Melita.io senden
+        success = self.send_queue_message(device_eui, data=base64_payload, fport=fport)
+        
+        if success:
+            log.info("✅ Temperaturdaten erfolgreich an %s gesendet", device_eui)
+            log.info("   Payload: %s", base64_payload)
         else:
-            print(f"❌ Fehler beim Abrufen der Devices: {response.status_code}")
-            return None
-            
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Fehler beim Abrufen der Devices: {e}")
-        return None
-
-def get_melita_contracts():
-    """Holt alle verfügbaren Contracts von Melita.io"""
-    global melita_bearer_token
+            log.error("❌ Fehler beim Senden der Temperaturdaten an %s", device_eui)
+        
+        return success
     
-    if not melita_bearer_token:
-        print("❌ Kein Melita.io Bearer Token verfügbar")
-        return None
+    def _send_temperature_to_listed_device(self, i, total, device, fport):
+        """Sendet Temperaturdaten an ein Device aus der Liste von send_temperature_to_all_vicki_devices"""
+        device_eui = device.get('device_eui')
+        min_temp = device.get('min_temp')
+        max_temp = device.get('max_temp')
+        operational_mode = device.get('operational_mode')  # Optional
+        
+        if not all([device_eui, min_temp is not None, max_temp is not None]):
+            log.warning("⚠️  Unvollständige Daten für Device %s: %s", i, device)
+            return False
+        
+        log.info("\n📱 Device %s/%s: %s", i, total, device_eui)
+        
+        try:
+            return self.send_temperature_to_vicki_device(device_eui, min_temp, max_temp, operational_mode, fport)
+        except Exception as e:
+            log.error("❌ Unerwarteter Fehler bei Device %s: %s", device_eui, e)
+            return False
+    
+    def send_temperature_to_all_vicki_devices(self, devices_data, fport=2, pacing_s=0, concurrency=None):
+        """
+        Sendet Temperaturdaten an alle vicki-Devices
+        devices_data: Liste von Dictionaries mit device_eui, min_temp, max_temp, operational_mode (optional)
+        pacing_s: Optionale feste Pause in Sekunden zwischen den Devices (Standard: keine).
+                  Ist eine Pause gesetzt, werden die Devices nacheinander bearbeitet.
+                  Ohne Pause begrenzt der Rate Limiter des Clients die Requests pro Sekunde.
+        concurrency: Anzahl Devices, die gleichzeitig bearbeitet werden (Standard: die des Clients)
+        """
+        if not devices_data:
+            log.warning("⚠️  Keine Devices-Daten übergeben")
+            return False
+        
+        total = len(devices_data)
+        log.info("🚀 Starte Temperatur-Synchronisation für %s vicki-Devices", total)
+        
+        # Melita.io Token sicherstellen (wird nur erneuert, wenn er fehlt oder abläuft)
+        if not self.refresh_token_if_needed():
+            log.error("❌ Konnte Melita.io Token nicht generieren")
+            return False
+        
+        if pacing_s:
+            results = []
+            for i, device in enumerate(devices_data, 1):
+                results.append(self._send_temperature_to_listed_device(i, total, device, fport))
+                
+                # Pause zwischen den Devices
+                if i < total:
+                    time.sleep(pacing_s)
+        else:
+            # Die Devices sind unabhängig voneinander, die Requests laufen parallel
+            with ThreadPoolExecutor(max_workers=max(1, concurrency or self.concurrency)) as executor:
+                results = list(executor.map(
+                    lambda item: self._send_temperature_to_listed_device(item[0], total, item[1], fport),
+                    enumerate(devices_data, 1)
+                ))
+        
+        success_count = sum(results)
+        error_count = total - success_count
+        
+        log.info("\n🎯 Temperatur-Synchronisation abgeschlossen:")
+        log.info("   ✅ Erfolgreich: %s", success_count)
+        log.info("   ❌ Fehler: %s", error_count)
+        log.info("   📊 Gesamt: %s", total)
+        
+        return success_count > 0
     
-    headers = get_melita_headers()
-    url = f"{MELITA_BASE_URL}/api/iot-gateway/contracts"
+    # Daten abrufen
     
-    print(f"📋 Hole alle verfügbaren Contracts von Melita.io...")
+    @circuit_break(None)
+    def _get_devices_page(self, contract_id, page, page_size):
+        """
+        Holt eine Seite Devices von Melita.io
+        
+        Die letzte Seite wird über 'last' bzw. 'totalPages' der Antwort oder eine leere Seite
+        erkannt, nicht über die Anzahl Devices (Melita.io kann pageSize begrenzen).
+        
+        Returns:
+            tuple: (devices, is_last) oder None bei Fehlern
+        """
+        if not self.refresh_token_if_needed():
+            log.error("❌ Kein Melita.io Bearer Token verfügbar")
+            return None
+        
+        params = {'pageSize': page_size, 'page': page}
+        if contract_id:
+            params['contractId'] = contract_id
+        
+        try:
+            response = self._session.get(self._devices_url, params=params, timeout=30)
+            if response.status_code == 200:
+                data = _json_loads(response.content)
+                
+                # Verschiedene Response-Strukturen unterstützen
+                devices = None
+                if 'content' in data:
+                    devices = data['content']
+                elif 'devices' in data:
+                    devices = data['devices']
+                elif 'data' in data:
+                    devices = data['data']
+                elif 'results' in data:
+                    devices = data['results']
+                elif 'items' in data:
+                    devices = data['items']
+                devices = devices or []
+                
+                log.debug("   Seite %s: %s Devices", page, len(devices))
+                is_last = not devices or data.get('last') is True
+                if 'totalPages' in data:
+                    is_last = is_last or page + 1 >= data['totalPages']
+                return devices, is_last
+            else:
+                log.error("❌ Fehler beim Abrufen der Devices (Seite %s): %s", page, response.status_code)
+                return None
+        
+        except (requests.exceptions.RequestException, ValueError) as e:
+            log.error("❌ Fehler beim Abrufen der Devices (Seite %s): %s", page, e)
+            return None
     
-    try:
-        response = requests.get(url, headers=headers, timeout=30)
-        if response.status_code == 200:
-            data = response.json()
+    def _iter_device_pages(self, contract_id, page_size):
+        """Liefert die Device-Seiten nacheinander, bei einem Fehler als letztes Element None"""
+        if contract_id:
+            log.info("🔍 Hole alle Devices für Contract ID: %s", contract_id)
+        else:
+            log.info("🔍 Hole alle verfügbaren Devices")
+        
+        page = 0
+        previous = None
+        while True:
+            result = self._get_devices_page(contract_id, page, page_size)
+            if result is None:
+                yield None
+                return
             
-            if 'contracts' in data and isinstance(data['contracts'], list):
-                contracts = data['contracts']
-                print(f"✅ {len(contracts)} Contracts erfolgreich geladen")
-                return contracts
-            else:
-                print(f"⚠️  Keine Contracts in der Antwort gefunden")
+            devices, is_last = result
+            if devices == previous:
+                # Endpunkt ignoriert 'page' und liefert immer dieselbe Seite
+                log.warning("⚠️  Seite %s wiederholt die vorherige Seite - Abbruch", page)
+                return
+            yield devices
+            if is_last:
+                return
+            previous = devices
+            page += 1
+    
+    def iter_devices(self, contract_id=None, page_size=MELITA_DEVICES_PAGE_SIZE):
+        """
+        Liefert alle Devices von Melita.io einzeln (optional gefiltert nach Contract)
+        
+        Die Seiten werden erst beim Weiterlesen geholt, es liegt immer nur eine Seite im Speicher.
+        Bei einem Fehler endet die Iteration vorzeitig (Meldung im Log).
+        """
+        for devices in self._iter_device_pages(contract_id, page_size):
+            if devices is None:
+                return
+            yield from devices
+    
+    def cache_clear(self):
+        """Leert den Kurzzeit-Cache dieses Clients (Contracts/Devices)"""
+        with self._cache_lock:
+            self._cache.clear()
+    
+    @ttl_cache()
+    def get_devices(self, contract_id=None, page_size=MELITA_DEVICES_PAGE_SIZE):
+        """
+        Holt alle verfügbaren Devices von Melita.io über alle Seiten
+        (pro contract_id für MELITA_CACHE_TTL Sekunden gecacht)
+        
+        Returns:
+            list: Devices (leer falls keine vorhanden) oder None bei Fehlern
+        """
+        all_devices = []
+        for devices in self._iter_device_pages(contract_id, page_size):
+            if devices is None:
                 return None
+            all_devices.extend(devices)
+        
+        if all_devices:
+            log.info("✅ %s Devices erfolgreich geladen", len(all_devices))
         else:
-            print(f"❌ Fehler beim Abrufen der Contracts: {response.status_code}")
+            log.warning("⚠️  Keine Devices in der Antwort gefunden")
+        return all_devices
+    
+    @ttl_cache()
+    @circuit_break(None)
+    def get_contracts(self):
+        """Holt alle verfügbaren Contracts von Melita.io (für MELITA_CACHE_TTL Sekunden gecacht)"""
+        if not self.refresh_token_if_needed():
+            log.error("❌ Kein Melita.io Bearer Token verfügbar")
             return None
-            
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Fehler beim Abrufen der Contracts: {e}")
-        return None
+        
+        log.info("📋 Hole alle verfügbaren Contracts von Melita.io...")
+        
+        try:
+            response = self._session.get(self._contracts_url, timeout=30)
+            if response.status_code == 200:
+                data = _json_loads(response.content)
+                
+                if 'contracts' in data and isinstance(data['contracts'], list):
+                    contracts = data['contracts']
+                    log.info("✅ %s Contracts erfolgreich geladen", len(contracts))
+                    return contracts
+                else:
+                    log.warning("⚠️  Keine Contracts in der Antwort gefunden")
+                    return None
+            else:
+                log.error("❌ Fehler beim Abrufen der Contracts: %s", response.status_code)
+                return None
+        
+        except (requests.exceptions.RequestException, ValueError) as e:
+            log.error("❌ Fehler beim Abrufen der Contracts: %s", e)
+            return None
+
+# Standard-Client für die Modulfunktionen (MELITA_API_KEY aus .env)
+_default = MelitaClient(MELITA_API_KEY)
+
+def get_default_melita_client():
+    """Gibt den Standard-Client zurück, den die Modulfunktionen nutzen"""
+    return _default
+
+# Modulfunktionen (delegieren an den Standard-Client)
+def check_melita_connection():
+    """Testet die Verbindung zu Melita.io"""
+    return _default.check_connection()
+
+def generate_melita_bearer_token():
+    """Generiert einen Bearer Token für Melita.io über den Auth-Endpunkt"""
+    return _default.generate_bearer_token()
+
+def get_melita_headers():
+    """Gibt die HTTP-Header mit dem aktuellen Melita.io Bearer Token zurück"""
+    return _default.headers()
+
+def is_melita_token_valid():
+    """Prüft ob ein Token vorhanden ist, das nicht innerhalb von TOKEN_EXPIRY_MARGIN abläuft"""
+    return _default.is_token_valid()
+
+def refresh_melita_token_if_needed():
+    """Erneuert den Token falls er fehlt oder demnächst abläuft, sonst wird der gecachte Token genutzt"""
+    return _default.refresh_token_if_needed()
+
+def renew_melita_token(rejected_token):
+    """Erneuert den Token nach einer 403-Antwort (nur einmal, auch bei parallelen Aufrufen)"""
+    return _default.renew_token(rejected_token)
+
+def is_melita_circuit_open():
+    """Prüft ob der Circuit Breaker offen ist (Melita.io gilt vorübergehend als nicht erreichbar)"""
+    return _default.is_circuit_open()
+
+def flush_melita_device_queue(device_eui):
+    """Leert die Queue eines Melita.io Devices vor dem Senden neuer Nachrichten"""
+    return _default.flush_device_queue(device_eui)
+
+def send_melita_queue_message(device_eui, data="FRg=", fport=2, confirmed=False, idempotency_key=None):
+    """Sendet eine Queue-Nachricht an ein Melita.io Device (leert die Queue nur, wenn sie belegt ist)"""
+    return _default.send_queue_message(device_eui, data=data, fport=fport, confirmed=confirmed,
+                                       idempotency_key=idempotency_key)
+
+def send_temperature_to_vicki_device(device_eui, min_temp, max_temp, operational_mode=None, fport=2):
+    """Sendet Temperaturdaten an ein vicki-Device"""
+    return _default.send_temperature_to_vicki_device(device_eui, min_temp, max_temp, operational_mode, fport)
+
+def send_temperature_to_all_vicki_devices(devices_data, fport=2, pacing_s=0, concurrency=MELITA_CONCURRENCY):
+    """Sendet Temperaturdaten an alle vicki-Devices (siehe MelitaClient.send_temperature_to_all_vicki_devices)"""
+    return _default.send_temperature_to_all_vicki_devices(devices_data, fport, pacing_s, concurrency)
+
+def iter_melita_devices(contract_id=None, page_size=MELITA_DEVICES_PAGE_SIZE):
+    """Liefert alle Devices von Melita.io einzeln, die Seiten werden erst beim Weiterlesen geholt"""
+    return _default.iter_devices(contract_id, page_size)
+
+def get_melita_devices(contract_id=None, page_size=MELITA_DEVICES_PAGE_SIZE):
+    """Holt alle verfügbaren Devices von Melita.io (pro contract_id für MELITA_CACHE_TTL Sekunden gecacht)"""
+    return _default.get_devices(contract_id, page_size)
+
+get_melita_devices.cache_clear = _default.cache_clear
+
+def get_melita_contracts():
+    """Holt alle verfügbaren Contracts von Melita.io (für MELITA_CACHE_TTL Sekunden gecacht)"""
+    return _default.get_contracts()
+
+get_melita_contracts.cache_clear = _default.cache_clear
 
 # Hilfsfunktionen
 def is_melita_connected():
     """Prüft ob eine Verbindung zu Melita.io besteht"""
-    return melita_bearer_token is not None
+    return _default.is_connected()
 
 def get_melita_token_info():
     """Gibt Informationen über den aktuellen Token zurück"""
-    if melita_bearer_token:
-        return {
-            'has_token': True,
-            'token_preview': f"{melita_bearer_token[:20]}...{melita_bearer_token[-20:]}"
-        }
-    else:
-        return {
-            'has_token': False,
-            'token_preview': None
-        }
+    return _default.token_info()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rate Limiter für HTTP-Requests (Melita.io, Thingsboard, Agility)
+Ohne Seiteneffekte beim Import, kann daher auch ohne Melita.io genutzt werden
+"""
+
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Token-Bucket Rate Limiter (threadsicher)
+    
+    acquire() wartet nur, wenn mehr als rate Requests/Sekunde (plus capacity als Reserve)
+    angefordert werden - solange Tokens übrig sind, geht es ohne Pause weiter.
+    """
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Nimmt ein Token und wartet falls nötig, bis es verfügbar ist"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Das Token wird sofort reserviert; bei negativem Stand wartet der Aufrufer
+            # außerhalb der Sperre, bis es nachgefüllt ist
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
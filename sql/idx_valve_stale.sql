@@ -0,0 +1,21 @@
+-- Index für die Abfrage in check_valvePosition.py (execute_query)
+--
+-- Die Abfrage filtert auf tenant_id, brand, devicetype und
+-- COALESCE(percent_valve_open_ts_utc, '-infinity') < now() - interval '2 hour'.
+-- Mit diesem Index kann der Planer pro (tenant_id, brand, devicetype) einen
+-- Index Range Scan statt eines Seq Scan über alle Geräte ausführen.
+--
+-- Ein partieller Index mit now() im WHERE ist nicht möglich (now() ist nicht
+-- IMMUTABLE), daher wird der Zeitstempel als letzte Index-Spalte geführt.
+--
+-- Der Index muss auf der Basistabelle von hmreporting.v_device_valve_last
+-- angelegt werden. Aufruf:
+--   psql -v base_table=<schema.tabelle> -f sql/idx_valve_stale.sql
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_valve_stale
+    ON :base_table (
+        tenant_id,
+        brand,
+        devicetype,
+        (COALESCE(percent_valve_open_ts_utc, '-infinity'))
+    );
@@ -11,23 +11,51 @@ Verwendung:
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import argparse
+import logging
 import sys
 import os
 from datetime import datetime, timezone
 import json
+import re
+import functools
+import threading
+import time
+from collections import Counter, OrderedDict
+from enum import Enum
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from heatmanager_common.config import (
     THINGSBOARD_BASE_URL,
     THINGSBOARD_USERNAME,
     THINGSBOARD_PASSWORD,
-    AGILITY_URL
+    AGILITY_URL,
+    AGILITY_BATCH_URL
 )
+from heatmanager_common.ratelimit import TokenBucket
+
+# orjson (optional, pip install orjson) ist beim Parsen und Erzeugen von JSON deutlich schneller
+try:
+    import orjson
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+    
+    def _json_pretty(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode('utf-8')
+except ImportError:
+    _json_loads = json.loads
+    
+    def _json_dumps(obj):
+        return json.dumps(obj).encode('utf-8')
+    
+    def _json_pretty(obj):
+        return json.dumps(obj, indent=2, ensure_ascii=False)
 
 # Globale Variablen
 HEADERS = {}
 TOKEN = ""
-LOG_FILE = None
 
 # Standardwerte
 DEFAULT_FPORT = 10
@@ -35,6 +63,197 @@ DEFAULT_FPORT = 10
 # Device-Typen die unterstützt werden
 SUPPORTED_DEVICE_TYPES = ['dnt-LW-eTRV-C', 'dnt-LW-eTRV']
 
+# Anzahl gleichzeitiger HTTP-Requests an Thingsboard
+MAX_WORKERS = 16
+
+# Verbindungen pro Host im Connection-Pool (mindestens; wächst mit --concurrency)
+POOL_MAXSIZE = 50
+
+# Anzahl Device-IDs pro Request beim Abrufen der Device-Details
+DEVICE_BATCH_SIZE = 100
+
+# Anzahl Entities pro Entity-Query beim Abrufen der Attribute
+ATTRIBUTE_BATCH_SIZE = 1000
+
+# Temperatur-Attribute (Asset und Device); nur diese werden aus der Entity-Query als Zahl gelesen
+TEMPERATURE_ATTRIBUTE_KEYS = frozenset(['minTemp', 'maxTemp', 'manu_temp_min', 'manu_temp_max'])
+
+# Attribut-Keys, unter denen die DevEUI gespeichert sein kann
+DEVEUI_ATTRIBUTE_KEYS = ['deveui', 'devEUI', 'devEui', 'DevEUI', 'DevEui', 'DEVEUI', 'eui', 'EUI']
+
+# Anzahl Downlinks pro Request an den Agility Batch-Endpunkt (AGILITY_BATCH_URL)
+AGILITY_BATCH_SIZE = 100
+
+# Cache für Device-Details und Attribute (Sekunden / maximale Anzahl Einträge)
+CACHE_TTL = 300
+CACHE_MAXSIZE = 4096
+
+
+class MeteredSession(requests.Session):
+    """
+    Session mit Backpressure und Zählern:
+    - höchstens concurrency Requests gleichzeitig (weitere warten auf einen freien Platz)
+    - optional höchstens rate Requests pro Sekunde (TokenBucket)
+    - metrics: Requests, gleichzeitig aktive/wartende Requests (inkl. Maximum), Fehler
+    """
+    
+    def __init__(self, concurrency=MAX_WORKERS, rate=None):
+        super().__init__()
+        self._lock = threading.Lock()
+        self.metrics = {'requests': 0, 'active': 0, 'max_active': 0, 'queued': 0, 'max_queued': 0, 'failed': 0}
+        self.set_limits(concurrency, rate)
+    
+    def set_limits(self, concurrency, rate=None):
+        """
+        Setzt die maximale Anzahl gleichzeitiger Requests und das Rate-Limit (Requests/Sekunde)
+        
+        Der Connection-Pool wird bei Bedarf vergrößert, damit jeder gleichzeitige Request
+        eine Keep-Alive-Verbindung behalten kann.
+        """
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self.rate_limiter = TokenBucket(rate, max(1, int(rate))) if rate else None
+        if concurrency > getattr(self, 'pool_maxsize', 0):
+            self.mount_pool(max(POOL_MAXSIZE, concurrency))
+    
+    def mount_pool(self, pool_maxsize):
+        """Hängt einen Connection-Pool (Keep-Alive) mit Retry bei 429/5xx für http und https ein"""
+        adapter = HTTPAdapter(
+            pool_connections=20,
+            pool_maxsize=pool_maxsize,
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 502, 503, 504])
+        )
+        for prefix in ("https://", "http://"):
+            old_adapter = self.adapters.get(prefix)
+            self.mount(prefix, adapter)
+            if old_adapter:
+                old_adapter.close()
+        self.pool_maxsize = pool_maxsize
+    
+    def _count(self, key, delta):
+        with self._lock:
+            self.metrics[key] += delta
+            if key in ('active', 'queued'):
+                self.metrics['max_' + key] = max(self.metrics['max_' + key], self.metrics[key])
+    
+    def request(self, method, url, *args, **kwargs):
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        if not self._slots.acquire(blocking=False):
+            # Alle Plätze belegt: warten
+            self._count('queued', 1)
+            self._slots.acquire()
+            self._count('queued', -1)
+        self._count('active', 1)
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except requests.exceptions.RequestException:
+            self._count('failed', 1)
+            raise
+        finally:
+            self._count('active', -1)
+            self._count('requests', 1)
+            self._slots.release()
+        if response.status_code == 429 or response.status_code >= 500:
+            self._count('failed', 1)
+        return response
+
+
+def create_session():
+    """
+    Erstellt eine HTTP-Session mit Connection-Pool (Keep-Alive) und Retry bei 429/5xx
+    
+    Returns:
+        MeteredSession: Konfigurierte Session
+    """
+    session = MeteredSession()
+    session.headers["Content-Type"] = "application/json"
+    return session
+
+
+# Gemeinsame Sessions für Thingsboard und Agility (TLS-Verbindungen werden wiederverwendet)
+TB_SESSION = create_session()
+AG_SESSION = create_session()
+
+
+class TTLCache:
+    """
+    Thread-sicherer LRU-Cache, dessen Einträge nach ttl Sekunden ablaufen
+    
+    Ist der Cache voll, wird der am längsten nicht benutzte Eintrag entfernt.
+    """
+    
+    def __init__(self, maxsize=CACHE_MAXSIZE, ttl=CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+    
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_MISSING = object()
+
+
+def ttl_cache(maxsize=CACHE_MAXSIZE, ttl=CACHE_TTL):
+    """
+    Decorator: Merkt sich Ergebnisse pro Argumentkombination in einem TTLCache
+    
+    Gleichzeitige Aufrufe mit denselben Argumenten warten auf den ersten Aufruf,
+    statt denselben Request parallel abzusetzen. None (Fehler) wird nicht gecacht.
+    Leeren mit func.cache_clear().
+    """
+    def decorator(func):
+        cache = TTLCache(maxsize, ttl)
+        key_locks = {}
+        key_locks_lock = threading.Lock()
+        
+        @functools.wraps(func)
+        def wrapper(*args):
+            value = cache.get(args, _MISSING)
+            if value is not _MISSING:
+                return value
+            
+            with key_locks_lock:
+                key_lock = key_locks.setdefault(args, threading.Lock())
+            with key_lock:
+                value = cache.get(args, _MISSING)
+                if value is _MISSING:
+                    value = func(*args)
+                    if value is not None:
+                        cache.set(args, value)
+            with key_locks_lock:
+                key_locks.pop(args, None)
+            return value
+        
+        wrapper.cache_clear = cache.clear
+        return wrapper
+    return decorator
+
+
+# Bereits geladene Devices {device_id: device}
+DEVICE_CACHE = TTLCache()
+
 
 def setup_log_file(customer_id):
     """
@@ -58,30 +277,180 @@ def setup_log_file(customer_id):
     return str(log_path)
 
 
-def log_print(*args, **kwargs):
+# Ausgaben gehen über das logging-Modul auf stdout und (gepuffert) in die Log-Datei
+log = logging.getLogger("sync_temp")
+log.setLevel(logging.INFO)
+log.propagate = False
+
+
+class _BlockBufferedHandler(logging.StreamHandler):
     """
-    Druckt sowohl auf stdout als auch in die Log-Datei
+    StreamHandler ohne flush() nach jeder Zeile
     
-    Args:
-        *args: Argumente für print()
-        **kwargs: Keyword-Argumente für print()
+    Die Zeilen landen im Puffer des Streams und werden blockweise geschrieben; nur bei
+    Fehlern (ERROR) wird sofort geschrieben, sonst beim Schließen bzw. über logging.shutdown.
     """
-    # Drucke auf stdout
-    print(*args, **kwargs)
     
-    # Drucke auch in Log-Datei falls vorhanden
-    if LOG_FILE:
+    def emit(self, record):
         try:
-            # Konvertiere alle Argumente zu Strings
-            message = ' '.join(str(arg) for arg in args)
-            # Füge Newline hinzu falls nicht vorhanden
-            if not message.endswith('\n'):
-                message += '\n'
-            LOG_FILE.write(message)
-            LOG_FILE.flush()  # Stelle sicher, dass sofort geschrieben wird
-        except Exception as e:
-            # Bei Fehler einfach auf stdout ausgeben
-            print(f"⚠️  Fehler beim Schreiben in Log-Datei: {e}", file=sys.stderr)
+            self.stream.write(self.format(record) + self.terminator)
+            if record.levelno >= logging.ERROR:
+                self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+
+# Emoji -> ASCII für Ausgaben ohne Terminal (Log-Datei, Pipe, cron)
+_ASCII_ICONS = str.maketrans({
+    '❌': 'ERR', '⚠': 'WARN', '📤': 'SEND', '✅': 'OK', 'ℹ': 'INFO', '📊': '==',
+    '📝': '*', '🌡': '*', '👤': '*', '🌐': '*', '📡': '*', '📦': '*', '🔌': '*',
+    '🔢': '*', '🧵': '*', '🚦': '*', '⏰': '*', '🔍': '*',
+    '\ufe0f': None,  # Variation Selector (Emoji-Darstellung)
+})
+
+
+class _AsciiFormatter(logging.Formatter):
+    """
+    Formatter, der Emoji durch ASCII-Kürzel ersetzt (siehe _ASCII_ICONS)
+    
+    Ersetzt wird schon in msg und den Argumenten, damit Spaltenbreiten wie in ROW_FMT
+    für den ASCII-Text gelten und die Tabelle ausgerichtet bleibt.
+    """
+    
+    def format(self, record):
+        record = logging.makeLogRecord(record.__dict__)
+        if isinstance(record.msg, str):
+            record.msg = record.msg.translate(_ASCII_ICONS)
+        if isinstance(record.args, tuple):
+            record.args = tuple(arg.translate(_ASCII_ICONS) if isinstance(arg, str) else arg
+                                for arg in record.args)
+        return super().format(record).translate(_ASCII_ICONS)
+
+
+_LOG_FORMATTER = logging.Formatter("%(message)s")
+_ASCII_LOG_FORMATTER = _AsciiFormatter("%(message)s")
+# Im Terminal jede Zeile sofort und mit Emoji anzeigen, sonst (Pipe, cron) blockweise in ASCII
+if sys.stdout.isatty():
+    _stdout_handler = logging.StreamHandler(sys.stdout)
+    _stdout_handler.setFormatter(_LOG_FORMATTER)
+else:
+    _stdout_handler = _BlockBufferedHandler(sys.stdout)
+    _stdout_handler.setFormatter(_ASCII_LOG_FORMATTER)
+log.addHandler(_stdout_handler)
+
+# Handler für die Log-Datei (siehe open_log_file / close_log_file)
+_file_handler = None
+
+# Puffergröße der Log-Datei in Bytes
+LOG_FILE_BUFFERING = 65536
+
+# Trennlinien für Tabelle (120) und Kopf/Zusammenfassung (80)
+SEP_120 = '=' * 120
+SEP_80 = '=' * 80
+
+# Tabellenzeile: Spalten Asset und Device (auf 29 Zeichen gekürzt) und DevEUI werden pro
+# Asset bzw. Device einmal formatiert (NAME_COL, DEVEUI_COL), danach Aktion und Details
+NAME_COL = "%-30.29s "
+DEVEUI_COL = "%-20s "
+DEVEUI_NA_COL = DEVEUI_COL % 'N/A'
+# Leere Details-Spalte (10 Zeichen)
+_PAD10 = " " * 10
+ROW_FMT = "%s%-30s " + _PAD10
+TABLE_HEADER = (NAME_COL % 'Asset Name' + NAME_COL % 'Device Name' + DEVEUI_COL % 'DevEUI'
+                + "%-30s %-10s" % ('Aktion', 'Details'))
+
+# Ausgabepuffer pro Thread (siehe buffered_call)
+_OUTPUT = threading.local()
+
+
+class _BufferFilter(logging.Filter):
+    """Hält Log-Einträge zurück, solange der aktuelle Thread in buffered_call läuft"""
+    
+    def filter(self, record):
+        buffer = getattr(_OUTPUT, 'buffer', None)
+        if buffer is not None:
+            buffer.append(record)
+            return False
+        return True
+
+
+log.addFilter(_BufferFilter())
+
+# Logger für die Zeilen pro Device (mit --quiet nur Fehler); die Einträge laufen über
+# die Handler von log, der Filter muss aber am Logger selbst hängen
+row_log = log.getChild("rows")
+row_log.addFilter(_BufferFilter())
+
+
+def open_log_file(log_path):
+    """
+    Schreibt die Ausgaben zusätzlich in die Log-Datei
+    
+    Die Zeilen werden ohne Emoji (siehe _AsciiFormatter) und in Blöcken von
+    LOG_FILE_BUFFERING Bytes geschrieben (siehe _BlockBufferedHandler).
+    
+    Args:
+        log_path: Pfad zur Log-Datei
+    """
+    global _file_handler
+    _file_handler = _BlockBufferedHandler(
+        open(log_path, 'w', encoding='utf-8', buffering=LOG_FILE_BUFFERING)
+    )
+    _file_handler.setFormatter(_ASCII_LOG_FORMATTER)
+    log.addHandler(_file_handler)
+
+
+def close_log_file():
+    """Schreibt den Puffer der Log-Datei und schließt sie"""
+    global _file_handler
+    if _file_handler:
+        log.removeHandler(_file_handler)
+        _file_handler.close()
+        _file_handler.stream.close()  # schreibt den Puffer
+        _file_handler = None
+
+
+def buffered_call(func, *args):
+    """
+    Ruft func auf und sammelt dabei alle Log-Einträge des aktuellen Threads
+    
+    So können parallel laufende Aufrufe ihre Zeilen danach geordnet ausgeben
+    (mit log.handle(record)).
+    
+    Returns:
+        tuple: (Ergebnis von func, Liste der LogRecords)
+    """
+    _OUTPUT.buffer = []
+    try:
+        return func(*args), _OUTPUT.buffer
+    finally:
+        _OUTPUT.buffer = None
+
+
+def fetch_parallel(func, items, max_workers=None):
+    """
+    Ruft func für alle items parallel auf
+    
+    Die Aufrufe sind reine Netzwerk-Requests, die Threads warten also fast nur
+    auf Antworten. Die Ergebnisse kommen in der Reihenfolge der items zurück.
+    
+    Args:
+        func: Funktion mit einem Argument
+        items: Argumente für func
+        max_workers: Maximale Anzahl gleichzeitiger Aufrufe (Standard: MAX_WORKERS)
+    
+    Returns:
+        list: Ergebnisse von func
+    """
+    max_workers = max_workers or MAX_WORKERS
+    items = list(items)
+    if len(items) <= 1:
+        return [func(item) for item in items]
+    
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(func, items))
 
 
 def login_to_thingsboard():
@@ -95,73 +464,95 @@ def login_to_thingsboard():
     }
     
     try:
-        response = requests.post(url, json=login_data, headers={"Content-Type": "application/json"})
+        response = TB_SESSION.post(url, data=_json_dumps(login_data))
         
         if response.status_code == 200:
-            data = response.json()
+            data = _json_loads(response.content)
             TOKEN = data.get('token', '')
             HEADERS = {
                 "Content-Type": "application/json",
                 "Authorization": f"Bearer {TOKEN}"
             }
-            log_print(f"✅ Login erfolgreich")
+            TB_SESSION.headers.update(HEADERS)
+            log.info(f"✅ Login erfolgreich")
             return True
         else:
-            log_print(f"❌ Login fehlgeschlagen: {response.status_code} - {response.text}")
+            log.error(f"❌ Login fehlgeschlagen: {response.status_code} - {response.text}")
             return False
             
-    except requests.exceptions.RequestException as e:
-        log_print(f"❌ Fehler beim Login: {e}")
+    except (requests.exceptions.RequestException, ValueError) as e:
+        log.error(f"❌ Fehler beim Login: {e}")
         return False
 
 
-def get_customer_assets(customer_id, page_size=1000):
+def get_customer_assets_page(customer_id, page, page_size):
     """
-    Holt alle Assets eines Customers
+    Holt eine Seite Assets eines Customers
     
     Args:
         customer_id: Customer ID
-        page_size: Seitengröße für API-Abfragen
+        page: Seitennummer (ab 0)
+        page_size: Seitengröße
     
     Returns:
-        list: Liste der Assets
+        dict: Antwort mit 'data' und 'totalPages' oder None bei HTTP-Fehlern
+              (Verbindungsfehler werden weitergereicht)
     """
     url = f"{THINGSBOARD_BASE_URL}/api/customer/{customer_id}/assets"
     params = {
         "pageSize": page_size,
-        "page": 0
+        "page": page
     }
     
+    response = TB_SESSION.get(url, params=params)
+    
+    if response.status_code == 200:
+        return _json_loads(response.content)
+    
+    log.error(f"❌ Fehler beim Abrufen der Customer-Assets: {response.status_code} - {response.text}")
+    return None
+
+
+def get_customer_assets(customer_id, page_size=1000):
+    """
+    Holt alle Assets eines Customers
+    
+    Die erste Seite liefert totalPages, die restlichen Seiten werden danach parallel geholt.
+    
+    Args:
+        customer_id: Customer ID
+        page_size: Seitengröße für API-Abfragen
+    
+    Returns:
+        list: Liste der Assets
+    """
     all_assets = []
-    page = 0
     
     try:
-        while True:
-            params["page"] = page
-            response = requests.get(url, headers=HEADERS, params=params)
-            
-            if response.status_code == 200:
-                assets_data = response.json()
-                assets = assets_data.get('data', [])
-                total_pages = assets_data.get('totalPages', 0)
-                
-                all_assets.extend(assets)
-                
-                if page >= total_pages - 1:
-                    break
-                    
-                page += 1
-            else:
-                log_print(f"❌ Fehler beim Abrufen der Customer-Assets: {response.status_code} - {response.text}")
+        first_page = get_customer_assets_page(customer_id, 0, page_size)
+        if first_page is None:
+            return all_assets
+        
+        total_pages = first_page.get('totalPages', 0)
+        pages = [first_page] + fetch_parallel(
+            lambda page: get_customer_assets_page(customer_id, page, page_size),
+            range(1, total_pages)
+        )
+        
+        # Seiten in Reihenfolge übernehmen, bei einer fehlerhaften Seite abbrechen
+        for assets_data in pages:
+            if assets_data is None:
                 break
+            all_assets.extend(assets_data.get('data', []))
                 
-    except requests.exceptions.RequestException as e:
-        log_print(f"❌ Fehler beim Abrufen der Customer-Assets: {e}")
+    except (requests.exceptions.RequestException, ValueError) as e:
+        log.error(f"❌ Fehler beim Abrufen der Customer-Assets: {e}")
         return []
     
     return all_assets
 
 
+@ttl_cache()
 def get_asset_attributes(asset_id):
     """
     Holt Server-Attribute eines Assets (minTemp und maxTemp)
@@ -170,7 +561,7 @@ def get_asset_attributes(asset_id):
         asset_id: Asset ID
     
     Returns:
-        dict: Dictionary mit minTemp und maxTemp
+        dict: Dictionary mit minTemp und maxTemp oder None bei Verbindungsfehlern
     """
     url = f"{THINGSBOARD_BASE_URL}/api/plugins/telemetry/ASSET/{asset_id}/values/attributes"
     params = {
@@ -178,10 +569,10 @@ def get_asset_attributes(asset_id):
     }
     
     try:
-        response = requests.get(url, headers=HEADERS, params=params)
+        response = TB_SESSION.get(url, params=params)
         
         if response.status_code == 200:
-            attributes_data = response.json()
+            attributes_data = _json_loads(response.content)
             attributes_dict = {}
             
             if isinstance(attributes_data, list):
@@ -198,20 +589,20 @@ def get_asset_attributes(asset_id):
         else:
             return {'minTemp': None, 'maxTemp': None}
             
-    except requests.exceptions.RequestException as e:
-        log_print(f"   ⚠️  Fehler beim Abrufen der Asset-Attribute: {e}")
-        return {'minTemp': None, 'maxTemp': None}
+    except (requests.exceptions.RequestException, ValueError) as e:
+        log.warning(f"   ⚠️  Fehler beim Abrufen der Asset-Attribute: {e}")
+        return None
 
 
-def get_asset_devices(asset_id):
+def get_asset_device_ids(asset_id):
     """
-    Holt alle Devices die mit einem Asset verbunden sind
+    Holt die IDs aller Devices die mit einem Asset verbunden sind
     
     Args:
         asset_id: Asset ID
     
     Returns:
-        list: Liste der Devices
+        list: Liste der Device-IDs
     """
     url = f"{THINGSBOARD_BASE_URL}/api/relations"
     params = {
@@ -221,10 +612,10 @@ def get_asset_devices(asset_id):
     }
     
     try:
-        response = requests.get(url, headers=HEADERS, params=params)
+        response = TB_SESSION.get(url, params=params)
         
         if response.status_code == 200:
-            relations = response.json()
+            relations = _json_loads(response.content)
             device_ids = []
             
             if isinstance(relations, list):
@@ -236,49 +627,95 @@ def get_asset_devices(asset_id):
                             if device_id:
                                 device_ids.append(device_id)
             
-            # Hole Device-Details für alle Device-IDs
-            devices = []
-            for device_id in device_ids:
-                device = get_device_by_id(device_id)
-                if device:
-                    # Filtere nach unterstützten Device-Typen
-                    device_type = device.get('type', '')
-                    if device_type in SUPPORTED_DEVICE_TYPES:
-                        devices.append(device)
-            
-            return devices
+            return device_ids
         else:
             return []
             
-    except requests.exceptions.RequestException as e:
-        log_print(f"   ⚠️  Fehler beim Abrufen der Asset-Devices: {e}")
+    except (requests.exceptions.RequestException, ValueError) as e:
+        log.warning(f"   ⚠️  Fehler beim Abrufen der Asset-Relationen: {e}")
         return []
 
 
-def get_device_by_id(device_id):
+def get_devices_batch(device_ids):
     """
-    Holt ein Device nach ID
+    Holt mehrere Devices mit einem Request (/api/devices?deviceIds=...)
     
     Args:
-        device_id: Device ID
+        device_ids: Liste von Device-IDs (max. DEVICE_BATCH_SIZE)
     
     Returns:
-        dict: Device-Dictionary oder None
+        list: Liste der Devices
     """
-    url = f"{THINGSBOARD_BASE_URL}/api/device/{device_id}"
+    url = f"{THINGSBOARD_BASE_URL}/api/devices"
+    params = {
+        "deviceIds": ",".join(device_ids)
+    }
     
     try:
-        response = requests.get(url, headers=HEADERS)
+        response = TB_SESSION.get(url, params=params)
         
         if response.status_code == 200:
-            return response.json()
+            devices = _json_loads(response.content)
+            return devices if isinstance(devices, list) else []
         else:
-            return None
+            log.warning(f"   ⚠️  Fehler beim Abrufen der Devices: {response.status_code} - {response.text}")
+            return []
             
-    except requests.exceptions.RequestException as e:
-        return None
+    except (requests.exceptions.RequestException, ValueError) as e:
+        log.warning(f"   ⚠️  Fehler beim Abrufen der Devices: {e}")
+        return []
+
+
+def fetch_all_relations(asset_ids):
+    """
+    Holt die unterstützten Devices für alle Assets
+    
+    Die Relationen werden pro Asset (parallel) abgefragt, die Device-Details danach
+    gesammelt in Blöcken von DEVICE_BATCH_SIZE IDs - jedes Device nur einmal, auch
+    wenn es mit mehreren Assets verbunden ist. Devices aus DEVICE_CACHE werden
+    nicht erneut geholt.
+    
+    Args:
+        asset_ids: Liste von Asset-IDs
+    
+    Returns:
+        dict: {asset_id: [device, ...]} (nur SUPPORTED_DEVICE_TYPES)
+    """
+    device_ids_by_asset = dict(zip(asset_ids, fetch_parallel(get_asset_device_ids, asset_ids)))
+    
+    unique_ids = list(dict.fromkeys(
+        device_id for device_ids in device_ids_by_asset.values() for device_id in device_ids
+    ))
+    
+    devices_by_id = {}
+    missing_ids = []
+    for device_id in unique_ids:
+        device = DEVICE_CACHE.get(device_id)
+        if device is None:
+            missing_ids.append(device_id)
+        else:
+            devices_by_id[device_id] = device
+    
+    batches = [missing_ids[i:i + DEVICE_BATCH_SIZE] for i in range(0, len(missing_ids), DEVICE_BATCH_SIZE)]
+    for devices in fetch_parallel(get_devices_batch, batches):
+        for device in devices:
+            device_id = device.get('id', {}).get('id', '')
+            DEVICE_CACHE.set(device_id, device)
+            devices_by_id[device_id] = device
+    
+    # Filtere nach unterstützten Device-Typen
+    devices_by_id = {
+        device_id: device for device_id, device in devices_by_id.items()
+        if device.get('type', '') in SUPPORTED_DEVICE_TYPES
+    }
+    
+    return {
+        asset_id: [devices_by_id[device_id] for device_id in device_ids if device_id in devices_by_id]
+        for asset_id, device_ids in device_ids_by_asset.items()
+    }
 
 
+@ttl_cache()
 def get_device_attributes(device_id):
     """
     Holt Client-Attribute eines Devices (manu_temp_min und manu_temp_max)
@@ -287,7 +724,7 @@ def get_device_attributes(device_id):
         device_id: Device ID
     
     Returns:
-        dict: Dictionary mit manu_temp_min und manu_temp_max
+        dict: Dictionary mit manu_temp_min und manu_temp_max oder None bei Verbindungsfehlern
     """
     # Verwende direkt den CLIENT_SCOPE Endpunkt
     url = f"{THINGSBOARD_BASE_URL}/api/plugins/telemetry/DEVICE/{device_id}/values/attributes/CLIENT_SCOPE"
@@ -296,10 +733,10 @@ def get_device_attributes(device_id):
     }
     
     try:
-        response = requests.get(url, headers=HEADERS, params=params)
+        response = TB_SESSION.get(url, params=params)
         
         if response.status_code == 200:
-            attributes_data = response.json()
+            attributes_data = _json_loads(response.content)
             attributes_dict = {}
             
             if isinstance(attributes_data, list):
@@ -316,9 +753,152 @@ def get_device_attributes(device_id):
         else:
             return {'manu_temp_min': None, 'manu_temp_max': None}
             
-    except requests.exceptions.RequestException as e:
-        log_print(f"   ⚠️  Fehler beim Abrufen der Device-Attribute: {e}")
-        return {'manu_temp_min': None, 'manu_temp_max': None}
+    except (requests.exceptions.RequestException, ValueError) as e:
+        log.warning(f"   ⚠️  Fehler beim Abrufen der Device-Attribute: {e}")
+        return None
+
+
+def parse_attribute_value(key, value):
+    """
+    Wandelt einen Attributwert aus der Entity-Query zurück in seinen Typ
+    
+    Die Entity-Query liefert alle Werte als String ("20", "22.5", "70B3D5..."). Nur die
+    Temperatur-Attribute (TEMPERATURE_ATTRIBUTE_KEYS) werden als Zahl gelesen; alle anderen
+    bleiben Strings, sonst würde z.B. die DevEUI "0E00000000000001" zu 0.0.
+    
+    Args:
+        key: Attribut-Key
+        value: Attributwert als String
+    
+    Returns:
+        Zahl/String oder None wenn leer
+    """
+    if value is None or value == "":
+        return None
+    if key not in TEMPERATURE_ATTRIBUTE_KEYS:
+        return value
+    
+    try:
+        return json.loads(value)
+    except (ValueError, TypeError):
+        return value
+
+
+def bulk_fetch_attributes(entity_type, ids, keys, key_type="ATTRIBUTE"):
+    """
+    Holt Attribute für viele Entities über die Entity-Query (POST /api/entitiesQuery/find)
+    
+    Args:
+        entity_type: "ASSET" oder "DEVICE"
+        ids: Liste von Entity-IDs
+        keys: Liste der Attribut-Keys
+        key_type: "ATTRIBUTE" (alle Scopes), "CLIENT_ATTRIBUTE", "SERVER_ATTRIBUTE", ...
+    
+    Returns:
+        dict: {entity_id: {key: value}} (leere Attribute fehlen) oder None bei Fehler
+    """
+    url = f"{THINGSBOARD_BASE_URL}/api/entitiesQuery/find"
+    latest_values = [{"type": key_type, "key": key} for key in keys]
+    result = {}
+    
+    for start in range(0, len(ids), ATTRIBUTE_BATCH_SIZE):
+        batch = ids[start:start + ATTRIBUTE_BATCH_SIZE]
+        query = {
+            "entityFilter": {
+                "type": "entityList",
+                "entityType": entity_type,
+                "entityList": batch
+            },
+            "pageLink": {
+                "page": 0,
+                "pageSize": len(batch)
+            },
+            "latestValues": latest_values
+        }
+        
+        try:
+            response = TB_SESSION.post(url, data=_json_dumps(query))
+            
+            if response.status_code != 200:
+                log.warning(f"   ⚠️  Entity-Query fehlgeschlagen: {response.status_code}")
+                return None
+            
+            for entity in _json_loads(response.content).get('data', []):
+                entity_id = entity.get('entityId', {}).get('id')
+                latest = entity.get('latest', {}).get(key_type, {})
+                attributes = {}
+                for key, entry in latest.items():
+                    value = parse_attribute_value(key, entry.get('value') if isinstance(entry, dict) else entry)
+                    if value is not None:
+                        attributes[key] = value
+                result[entity_id] = attributes
+                
+        except (requests.exceptions.RequestException, ValueError) as e:
+            log.warning(f"   ⚠️  Fehler bei der Entity-Query: {e}")
+            return None
+    
+    return result
+
+
+def fetch_asset_attributes(asset_ids):
+    """
+    Holt minTemp und maxTemp für alle Assets (gesammelt, sonst einzeln als Fallback)
+    
+    Args:
+        asset_ids: Liste von Asset-IDs
+    
+    Returns:
+        dict: {asset_id: {'minTemp': ..., 'maxTemp': ...}}
+    """
+    attributes = bulk_fetch_attributes("ASSET", asset_ids, ["minTemp", "maxTemp"])
+    if attributes is None:
+        log.warning(f"   ⚠️  Hole Asset-Attribute einzeln")
+        return {
+            asset_id: attrs or {'minTemp': None, 'maxTemp': None}
+            for asset_id, attrs in zip(asset_ids, fetch_parallel(get_asset_attributes, asset_ids))
+        }
+    
+    return {
+        asset_id: {
+            'minTemp': attributes.get(asset_id, {}).get('minTemp'),
+            'maxTemp': attributes.get(asset_id, {}).get('maxTemp')
+        }
+        for asset_id in asset_ids
+    }
+
+
+def fetch_device_attributes(device_ids):
+    """
+    Holt manu_temp_min und manu_temp_max (CLIENT_SCOPE) für alle Devices
+    (gesammelt, sonst einzeln als Fallback)
+    
+    Args:
+        device_ids: Liste von Device-IDs
+    
+    Returns:
+        dict: {device_id: {'manu_temp_min': ..., 'manu_temp_max': ...}}
+    """
+    attributes = bulk_fetch_attributes("DEVICE", device_ids, ["manu_temp_min", "manu_temp_max"], "CLIENT_ATTRIBUTE")
+    if attributes is None:
+        log.warning(f"   ⚠️  Hole Device-Attribute einzeln")
+        return {
+            device_id: attrs or {'manu_temp_min': None, 'manu_temp_max': None}
+            for device_id, attrs in zip(device_ids, fetch_parallel(get_device_attributes, device_ids))
+        }
+    
+    return {
+        device_id: {
+            'manu_temp_min': attributes.get(device_id, {}).get('manu_temp_min'),
+            'manu_temp_max': attributes.get(device_id, {}).get('manu_temp_max')
+        }
+        for device_id in device_ids
+    }
+
+
+# Vorkompilierte Muster für normalize_deveui
+_DEVEUI_PREFIX_RE = re.compile(r'^EUI[-_]', re.IGNORECASE)
+_DEVEUI_STRIP = str.maketrans('', '', ' -:_')
+_DEVEUI_HEX_RE = re.compile(r'^[0-9A-F]{16}$')
 
 
 def normalize_deveui(deveui):
@@ -334,22 +914,17 @@ def normalize_deveui(deveui):
     if not deveui:
         return None
     
-    deveui = str(deveui).strip().upper()
-    # Entferne mögliche Präfixe wie "eui-" oder "EUI-"
-    deveui = deveui.replace('EUI-', '').replace('eui-', '').replace('EUI_', '').replace('eui_', '')
-    # Entferne Leerzeichen, Bindestriche, Doppelpunkte
-    deveui = deveui.replace(' ', '').replace('-', '').replace(':', '')
+    # Entferne mögliche Präfixe wie "eui-" oder "EUI_", danach Leerzeichen, Bindestriche,
+    # Doppelpunkte und Unterstriche
+    deveui = _DEVEUI_PREFIX_RE.sub('', str(deveui).strip().upper()).translate(_DEVEUI_STRIP)
     
     # Prüfe ob es ein gültiger DevEUI ist (16 hexadezimale Zeichen)
-    if len(deveui) == 16 and all(c in '0123456789ABCDEF' for c in deveui):
-        return deveui
-    
-    return None
+    return deveui if _DEVEUI_HEX_RE.match(deveui) else None
 
 
-def extract_deveui(device):
+def deveui_from_device(device):
     """
-    Extrahiert DevEUI aus einem Device-Objekt
+    Extrahiert die DevEUI aus Name, Label oder additionalInfo eines Devices (ohne Request)
     
     Args:
         device: Device-Dictionary von Thingsboard
@@ -357,40 +932,21 @@ def extract_deveui(device):
     Returns:
         str: DevEUI oder None
     """
-    device_id = device.get('id', {}).get('id', '')
-    
-    # 1. Versuche DevEUI aus Attributen zu holen
-    url = f"{THINGSBOARD_BASE_URL}/api/plugins/telemetry/DEVICE/{device_id}/values/attributes"
-    try:
-        response = requests.get(url, headers=HEADERS)
-        if response.status_code == 200:
-            all_attrs = response.json()
-            if isinstance(all_attrs, list):
-                for attr in all_attrs:
-                    if isinstance(attr, dict) and 'key' in attr:
-                        key = attr['key'].lower()
-                        if key in ['deveui', 'eui']:
-                            deveui = normalize_deveui(attr.get('value'))
-                            if deveui:
-                                return deveui
-    except:
-        pass
-    
-    # 2. Versuche DevEUI aus dem Device-Namen zu extrahieren
+    # 1. Versuche DevEUI aus dem Device-Namen zu extrahieren
     device_name = device.get('name', '').strip()
     if device_name:
         deveui = normalize_deveui(device_name)
         if deveui:
             return deveui
     
-    # 3. Versuche DevEUI aus dem Label zu extrahieren
-    device_label = device.get('label', '').strip()
+    # 2. Versuche DevEUI aus dem Label zu extrahieren
+    device_label = (device.get('label') or '').strip()
     if device_label:
         deveui = normalize_deveui(device_label)
         if deveui:
             return deveui
     
-    # 4. Prüfe additionalInfo
+    # 3. Prüfe additionalInfo
     additional_info = device.get('additionalInfo', {})
     if isinstance(additional_info, dict):
         for key in ['devEUI', 'devEui', 'DevEUI', 'DevEui', 'deveui', 'eui']:
@@ -402,36 +958,103 @@ def extract_deveui(device):
     return None
 
 
+def extract_deveui(device, attributes=None):
+    """
+    Extrahiert DevEUI aus einem Device-Objekt
+    
+    Zuerst aus Name, Label und additionalInfo (siehe deveui_from_device), erst danach
+    aus den Attributen des Devices.
+    
+    Args:
+        device: Device-Dictionary von Thingsboard
+        attributes: Bereits geladene DevEUI-Attribute {key: value} (siehe
+                    DEVEUI_ATTRIBUTE_KEYS); None = Attribute bei Bedarf per Request holen
+    
+    Returns:
+        str: DevEUI oder None
+    """
+    deveui = deveui_from_device(device)
+    if deveui:
+        return deveui
+    
+    # 4. Versuche DevEUI aus Attributen zu holen
+    if attributes is None:
+        attributes = {}
+        device_id = device.get('id', {}).get('id', '')
+        url = f"{THINGSBOARD_BASE_URL}/api/plugins/telemetry/DEVICE/{device_id}/values/attributes"
+        try:
+            response = TB_SESSION.get(url)
+            if response.status_code == 200:
+                all_attrs = _json_loads(response.content)
+                if isinstance(all_attrs, list):
+                    for attr in all_attrs:
+                        if isinstance(attr, dict) and 'key' in attr:
+                            attributes[attr['key']] = attr.get('value')
+        except:
+            pass
+    
+    for key, value in attributes.items():
+        if key.lower() in ['deveui', 'eui']:
+            deveui = normalize_deveui(value)
+            if deveui:
+                return deveui
+    
+    return None
+
+
+# Hex-Darstellung aller Byte-Werte ("00" bis "FF")
+_HEX256 = tuple(f"{i:02X}" for i in range(256))
+# Vollständige Temperatur-Payloads pro Byte-Wert (3E.. für min, 40.. für max)
+_MIN_HEX = tuple("3E" + h for h in _HEX256)
+_MAX_HEX = tuple("40" + h for h in _HEX256)
+
+
 def temperature_to_hex_payload(temperature, is_min=True):
     """
     Konvertiert eine Temperatur zu einem Hex-Payload
     
+    Die Asset-Temperaturen wiederholen sich stark, daher werden die Ergebnisse
+    gecacht (siehe _temperature_to_hex_payload).
+    
     Args:
         temperature: Temperatur als Zahl (z.B. 20 für 20°C)
         is_min: True für minTemp (3E), False für maxTemp (40)
     
     Returns:
-        str: Hex-Payload String (z.B. "3E28" für 20°C min)
+        str: Hex-Payload String (z.B. "3E28" für 20°C min) oder None, wenn die Temperatur
+             keine Zahl ist oder nicht in ein Byte passt (0 bis 127.5°C)
     """
     if temperature is None:
         return None
     
     try:
-        temp_value = float(temperature)
-        # Temperatur * 2
-        temp_hex = int(temp_value * 2)
-        
-        # Konvertiere zu Hex (1 Byte = 2 hex Zeichen)
-        temp_hex_str = format(temp_hex, '02X')
-        
-        # Füge Präfix hinzu: 3E für min, 40 für max
-        prefix = "3E" if is_min else "40"
-        
-        return f"{prefix}{temp_hex_str}"
-    except (ValueError, TypeError):
+        return _temperature_to_hex_payload(temperature, is_min)
+    except TypeError:
+        # Nicht hashbarer Wert, kann auch nicht in eine Zahl umgewandelt werden
         return None
 
 
+@functools.lru_cache(maxsize=256)
+def _temperature_to_hex_payload(temperature, is_min):
+    """Hex-Payload für eine Temperatur (gecacht pro Wert und Seite)"""
+    try:
+        # Temperatur * 2 (1 Byte)
+        temp_byte = int(float(temperature) * 2)
+    except (ValueError, TypeError, OverflowError):
+        return None
+    
+    # Außerhalb des Bytes nicht abschneiden, sonst würde ein falscher Sollwert gesendet
+    if not 0 <= temp_byte <= 255:
+        return None
+    
+    # Präfix 3E für min, 40 für max ist in der Tabelle enthalten
+    return (_MIN_HEX if is_min else _MAX_HEX)[temp_byte]
+
+
+# Query-Payload: BD für min, BF für max
+_QUERY_PAYLOAD = {True: "BD", False: "BF"}
+
+
 def get_query_payload(is_min=True):
     """
     Gibt den Query-Payload zurück (BD für min, BF für max)
@@ -442,7 +1065,7 @@ def get_query_payload(is_min=True):
     Returns:
         str: Hex-Payload String ("BD" oder "BF")
     """
-    return "BD" if is_min else "BF"
+    return _QUERY_PAYLOAD[bool(is_min)]
 
 
 def combine_query_payloads():
@@ -475,6 +1098,106 @@ def combine_temperature_payloads(min_temp, max_temp):
     return None
 
 
+class Action(Enum):
+    """Art des Downlinks: (Aktion, Aktion bei Fehler, Zähler in der Zusammenfassung)"""
+    
+    QUERY_MIN_MAX = ("📤 Query Min/Max Temp", "❌ Fehler Query Min/Max",
+                     ('min_query_sent', 'max_query_sent', 'combined_sent'))
+    SET_MIN_MAX = ("📤 Set Min/Max ({min}°C/{max}°C)", "❌ Fehler Min/Max",
+                   ('min_temp_sent', 'max_temp_sent', 'combined_sent'))
+    QUERY_MIN_SET_MAX = ("📤 Query Min, Set Max ({max}°C)", "❌ Fehler Min/Max",
+                         ('min_query_sent', 'max_temp_sent', 'combined_sent'))
+    SET_MIN_QUERY_MAX = ("📤 Set Min ({min}°C), Query Max", "❌ Fehler Min/Max",
+                         ('min_temp_sent', 'max_query_sent', 'combined_sent'))
+    QUERY_MIN = ("📤 Query Min Temp", "❌ Fehler Min", ('min_query_sent',))
+    SET_MIN = ("📤 Set Min Temp ({min}°C)", "❌ Fehler Min", ('min_temp_sent',))
+    QUERY_MAX = ("📤 Query Max Temp", "❌ Fehler Max", ('max_query_sent',))
+    SET_MAX = ("📤 Set Max Temp ({max}°C)", "❌ Fehler Max", ('max_temp_sent',))
+    
+    def __init__(self, label, error_label, counters):
+        self.label = label
+        self.error_label = error_label
+        self.counters = counters
+
+
+# Downlink je nach Bedarf: (needs_min, needs_max, min_is_query, max_is_query) -> Action
+DOWNLINK_RULES = {
+    (True, True, True, True): Action.QUERY_MIN_MAX,
+    (True, True, False, False): Action.SET_MIN_MAX,
+    (True, True, True, False): Action.QUERY_MIN_SET_MAX,
+    (True, True, False, True): Action.SET_MIN_QUERY_MAX,
+    (True, False, True, False): Action.QUERY_MIN,
+    (True, False, False, False): Action.SET_MIN,
+    (False, True, False, True): Action.QUERY_MAX,
+    (False, True, False, False): Action.SET_MAX,
+}
+
+
+def build_payload(asset_min, asset_max, device_min, device_max):
+    """
+    Bestimmt den einen Downlink, der ein Device auf die Asset-Temperaturen bringt
+    
+    Pro Seite wird die Temperatur gesetzt (3E/40 + temp*2), wenn das Device einen
+    abweichenden Wert hat, oder abgefragt (BD/BF), wenn das Device noch keinen Wert
+    hat. Min- und Max-Teil werden zu einem Payload zusammengefasst; werden beide
+    Temperaturen gesetzt, wird die Abfrage (BDBF) angehängt.
+    
+    Args:
+        asset_min: minTemp des Assets (None = nicht gesetzt)
+        asset_max: maxTemp des Assets (None = nicht gesetzt)
+        device_min: manu_temp_min des Devices (None = leer)
+        device_max: manu_temp_max des Devices (None = leer)
+    
+    Returns:
+        tuple: (payload, Action) oder None wenn nichts zu senden ist
+    """
+    # Prüfe welche Temperaturen gesendet werden müssen (nur wenn Asset-Temp vorhanden)
+    needs_min = asset_min is not None and device_min != asset_min
+    needs_max = asset_max is not None and device_max != asset_max
+    if not needs_min and not needs_max:
+        return None
+    
+    # Query wenn die Device-Temperatur leer ist, sonst setzen
+    min_is_query = needs_min and device_min is None
+    max_is_query = needs_max and device_max is None
+    
+    if needs_min and needs_max and not min_is_query and not max_is_query:
+        # Füge Query-Hex-Werte hinten an, z.B. "3E144030" + "BDBF"
+        parts = [combine_temperature_payloads(asset_min, asset_max), combine_query_payloads()]
+    else:
+        parts = []
+        if needs_min:
+            parts.append(_QUERY_PAYLOAD[True] if min_is_query
+                         else temperature_to_hex_payload(asset_min, is_min=True))
+        if needs_max:
+            parts.append(_QUERY_PAYLOAD[False] if max_is_query
+                         else temperature_to_hex_payload(asset_max, is_min=False))
+    if None in parts:
+        return None
+    
+    return "".join(parts), DOWNLINK_RULES[(needs_min, needs_max, min_is_query, max_is_query)]
+
+
+def build_downlink(deveui, fport, payload_hex):
+    """
+    Erstellt den Inhalt einer DevEUI_downlink-Nachricht für Agility Thingspark
+    
+    Args:
+        deveui: DevEUI des Devices
+        fport: FPort
+        payload_hex: Hexadezimales Payload
+    
+    Returns:
+        dict: Downlink mit Time, DevEUI, FPort und payload_hex
+    """
+    return {
+        "Time": datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S+00:00'),
+        "DevEUI": deveui,
+        "FPort": fport,
+        "payload_hex": payload_hex
+    }
+
+
 def send_downlink_to_agility(deveui, fport, payload_hex, dry_run=False):
     """
     Sendet eine Downlink-Nachricht an Agility Thingspark
@@ -489,48 +1212,216 @@ def send_downlink_to_agility(deveui, fport, payload_hex, dry_run=False):
         bool: True wenn erfolgreich, False bei Fehler
     """
     if not AGILITY_URL:
-        log_print(f"   ❌ AGILITY_URL nicht in .env konfiguriert")
+        log.error(f"   ❌ AGILITY_URL nicht in .env konfiguriert")
         return False
     
     # Erstelle JSON-Payload
-    current_time = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S+00:00')
+    payload = {
+        "DevEUI_downlink": build_downlink(deveui, fport, payload_hex)
+    }
+    
+    if dry_run:
+        if row_log.isEnabledFor(logging.INFO):
+            row_log.info(f"   📤 DRY-RUN: Würde senden an {AGILITY_URL}")
+            row_log.info(f"      Payload: {_json_pretty(payload)}")
+        return True
+    
+    try:
+        response = AG_SESSION.post(AGILITY_URL, data=_json_dumps(payload), timeout=30)
+        
+        if response.status_code in [200, 201, 202]:
+            row_log.info("   ✅ Downlink erfolgreich gesendet")
+            return True
+        else:
+            log.error(f"   ❌ Fehler beim Senden: {response.status_code} - {response.text}")
+            return False
+            
+    except requests.exceptions.RequestException as e:
+        log.error(f"   ❌ Fehler beim Senden: {e}")
+        return False
+
+
+def format_row_prefix(asset_col, device, deveui):
+    """Zeilenanfang (Asset, Device, DevEUI bzw. N/A) für die Ausgaben eines Devices"""
+    return (asset_col + NAME_COL % device.get('name', 'Unbekannt')
+            + (DEVEUI_COL % deveui if deveui else DEVEUI_NA_COL))
+
+
+def process_device(job):
+    """
+    Gleicht ein Device mit den Temperaturen seines Assets ab und bestimmt den nötigen Downlink
+    
+    Wird parallel aufgerufen; die Ausgaben werden gepuffert (siehe buffered_call) und
+    die Zähler als eigenes Statistik-Dictionary zurückgegeben. Der Downlink wird nicht
+    hier gesendet, sondern gesammelt über send_downlinks_to_agility.
+    
+    Args:
+        job: Tuple (asset_col, asset_min_temp, asset_max_temp, device, device_attrs, deveui_attrs);
+             asset_col ist der formatierte Asset-Name (NAME_COL)
     
+    Returns:
+        tuple: (Counter mit den Übersprungen-Zählern dieses Devices,
+                (deveui, payload, action, row_prefix) oder None wenn nichts zu senden ist;
+                row_prefix ist None, wenn die Zeilen pro Device ausgeschaltet sind (--quiet))
+    """
+    asset_col, asset_min_temp, asset_max_temp, device, device_attrs, deveui_attrs = job
+    # Zeilen pro Device nur aufbauen, wenn sie ausgegeben werden (nicht bei --quiet)
+    rows = row_log.isEnabledFor(logging.INFO)
+    stats = Counter()
+    
+    # Extrahiere DevEUI
+    deveui = extract_deveui(device, deveui_attrs)
+    
+    if not deveui:
+        if rows:
+            row_log.info(ROW_FMT, format_row_prefix(asset_col, device, None), '❌ Kein DevEUI')
+        stats['skipped_no_deveui'] += 1
+        return stats, None
+    
+    # Zeilenanfang (Asset, Device, DevEUI) für alle Ausgaben dieses Devices
+    row_prefix = format_row_prefix(asset_col, device, deveui) if rows else None
+    
+    # Device-Attribute (manu_temp_min, manu_temp_max)
+    device_min_temp = device_attrs.get('manu_temp_min')
+    device_max_temp = device_attrs.get('manu_temp_max')
+    
+    # Normalisiere: Behandle leere Strings, 0, etc. als None
+    if device_min_temp == "" or device_min_temp == 0:
+        device_min_temp = None
+    if device_max_temp == "" or device_max_temp == 0:
+        device_max_temp = None
+    
+    # Prüfe ob Asset-Temperaturen vorhanden sind und gib Meldung aus wenn leer
+    if asset_min_temp is None:
+        if rows:
+            row_log.info(ROW_FMT, row_prefix, '⚠️  Asset minTemp leer')
+        stats['skipped_empty_min_temp'] += 1
+    
+    if asset_max_temp is None:
+        if rows:
+            row_log.info(ROW_FMT, row_prefix, '⚠️  Asset maxTemp leer')
+        stats['skipped_empty_max_temp'] += 1
+    
+    # Wenn beide Asset-Temperaturen leer sind, überspringe dieses Device
+    if asset_min_temp is None and asset_max_temp is None:
+        return stats, None
+    
+    # Genau ein Downlink pro Device
+    downlink = build_payload(asset_min_temp, asset_max_temp, device_min_temp, device_max_temp)
+    if downlink is None:
+        # Ungültige Asset-Temperatur (keine Zahl oder außerhalb 0 bis 127.5°C): nichts senden
+        for name, temp, is_min in (('minTemp', asset_min_temp, True), ('maxTemp', asset_max_temp, False)):
+            if temp is not None and temperature_to_hex_payload(temp, is_min) is None:
+                row_log.warning(ROW_FMT, row_prefix or format_row_prefix(asset_col, device, deveui),
+                                f'⚠️  Asset {name} ungültig ({temp})')
+        return stats, None
+    
+    payload, action = downlink
+    # Ausgabe VOR dem Senden
+    if rows:
+        row_log.info(ROW_FMT, row_prefix, action.label.format(min=asset_min_temp, max=asset_max_temp))
+    
+    return stats, (deveui, payload, action, row_prefix)
+
+
+def send_downlink_batch(downlinks, fport, dry_run=False):
+    """
+    Sendet mehrere Downlinks in einem Request an den Agility Batch-Endpunkt (AGILITY_BATCH_URL)
+    
+    Args:
+        downlinks: Liste von (deveui, payload_hex) (ein Batch)
+        fport: FPort
+        dry_run: Wenn True, wird nur simuliert
+    
+    Returns:
+        bool: True wenn erfolgreich, False bei Fehler,
+              None wenn der Batch-Endpunkt nicht unterstützt wird
+    """
     payload = {
-        "DevEUI_downlink": {
-            "Time": current_time,
-            "DevEUI": deveui,
-            "FPort": fport,
-            "payload_hex": payload_hex
-        }
+        "DevEUI_downlink_batch": [build_downlink(deveui, fport, payload_hex) for deveui, payload_hex in downlinks]
     }
     
     if dry_run:
-        log_print(f"   📤 DRY-RUN: Würde senden an {AGILITY_URL}")
-        log_print(f"      Payload: {json.dumps(payload, indent=6)}")
+        log.info(f"   📤 DRY-RUN: Würde {len(downlinks)} Downlink(s) gebündelt senden an {AGILITY_BATCH_URL}")
         return True
     
     try:
-        response = requests.post(
-            AGILITY_URL,
-            json=payload,
-            headers={"Content-Type": "application/json"},
-            timeout=30
-        )
+        response = AG_SESSION.post(AGILITY_BATCH_URL, data=_json_dumps(payload), timeout=30)
         
         if response.status_code in [200, 201, 202]:
-            log_print(f"   ✅ Downlink erfolgreich gesendet")
+            log.info(f"   ✅ {len(downlinks)} Downlink(s) erfolgreich gebündelt gesendet")
             return True
+        elif response.status_code in [404, 405]:
+            return None
         else:
-            log_print(f"   ❌ Fehler beim Senden: {response.status_code} - {response.text}")
+            log.error(f"   ❌ Fehler beim gebündelten Senden: {response.status_code} - {response.text}")
             return False
             
     except requests.exceptions.RequestException as e:
-        log_print(f"   ❌ Fehler beim Senden: {e}")
+        log.error(f"   ❌ Fehler beim gebündelten Senden: {e}")
         return False
 
 
+def send_downlinks_to_agility(downlinks, fport, dry_run=False, batch_size=AGILITY_BATCH_SIZE):
+    """
+    Sendet alle Downlinks an Agility Thingspark
+    
+    Ist AGILITY_BATCH_URL gesetzt, wird ein Request pro batch_size Downlinks gesendet.
+    Unterstützt der Endpunkt das nicht (HTTP 404/405) oder ist keine Batch-URL gesetzt,
+    werden die Downlinks einzeln (parallel) über send_downlink_to_agility gesendet.
+    
+    Args:
+        downlinks: Liste von (deveui, payload_hex)
+        fport: FPort
+        dry_run: Wenn True, wird nur simuliert
+        batch_size: Anzahl Downlinks pro Batch-Request
+    
+    Returns:
+        list: (Erfolg, LogRecords) je Downlink, in der Reihenfolge von downlinks;
+              die Ausgaben eines Batch-Requests hängen am ersten Downlink des Batches
+    """
+    chunks = [downlinks[i:i + batch_size] for i in range(0, len(downlinks), batch_size)]
+    
+    if AGILITY_BATCH_URL and chunks:
+        # Erster Batch synchron: klärt, ob der Batch-Endpunkt unterstützt wird
+        first = buffered_call(send_downlink_batch, chunks[0], fport, dry_run)
+        if first[0] is not None:
+            results = []
+            chunk_results = [first] + fetch_parallel(
+                lambda chunk: buffered_call(send_downlink_batch, chunk, fport, dry_run), chunks[1:]
+            )
+            for chunk, (success, output) in zip(chunks, chunk_results):
+                if success is None:
+                    # Batch-Endpunkt nachträglich nicht mehr verfügbar: diesen Batch einzeln senden
+                    # (Meldung vor den Ausgaben des ersten Downlinks dieses Batches)
+                    _, note = buffered_call(
+                        log.warning, f"⚠️  Agility Batch-Endpunkt nicht verfügbar - sende {len(chunk)} Downlink(s) einzeln"
+                    )
+                    single = _send_downlinks_single(chunk, fport, dry_run)
+                    single[0] = (single[0][0], note + single[0][1])
+                    results.extend(single)
+                    continue
+                results.append((success, output))
+                results.extend((success, []) for _ in chunk[1:])
+            return results
+        
+        log.info(f"ℹ️  Agility Batch-Endpunkt nicht verfügbar - sende Downlinks einzeln")
+    
+    return _send_downlinks_single(downlinks, fport, dry_run)
+
+
+def _send_downlinks_single(downlinks, fport, dry_run=False):
+    """Sendet Downlinks einzeln (parallel); Rückgabe wie send_downlinks_to_agility"""
+    return fetch_parallel(
+        lambda downlink: buffered_call(send_downlink_to_agility, downlink[0], fport, downlink[1], dry_run),
+        downlinks
+    )
+
+
 def main():
     """Hauptfunktion"""
+    global MAX_WORKERS
+    
     parser = argparse.ArgumentParser(
         description="Überträgt min/max Temperatur von Thingsboard Assets auf Devices über Agility",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -555,6 +1446,12 @@ Beispiele:
         help="Simuliert das Senden ohne tatsächliche Nachrichten zu senden"
     )
     
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="Keine Zeile pro Device ausgeben, nur Fehler und Zusammenfassung"
+    )
+    
     parser.add_argument(
         "--fport",
         type=int,
@@ -569,100 +1466,137 @@ Beispiele:
         help="Begrenzt die Anzahl der zu verarbeitenden Devices (nützlich zum Testen)"
     )
     
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=MAX_WORKERS,
+        help=f"Maximale Anzahl gleichzeitiger Requests je Host (Standard: {MAX_WORKERS})"
+    )
+    
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=None,
+        help="Maximale Anzahl Requests pro Sekunde je Host (Standard: unbegrenzt)"
+    )
+    
     args = parser.parse_args()
+    fport = args.fport
+    dry_run = args.dry_run
+    
+    if args.concurrency < 1:
+        parser.error("--concurrency muss mindestens 1 sein")
+    if args.rate_limit is not None and args.rate_limit <= 0:
+        parser.error("--rate-limit muss größer als 0 sein")
+    
+    # Parallelität und Rate-Limit für Thingsboard und Agility
+    MAX_WORKERS = args.concurrency
+    for session in (TB_SESSION, AG_SESSION):
+        session.set_limits(args.concurrency, args.rate_limit)
+    
+    if args.quiet:
+        row_log.setLevel(logging.WARNING)
     
     # Erstelle Log-Datei
-    global LOG_FILE
     log_path = setup_log_file(args.customer_id)
     try:
-        LOG_FILE = open(log_path, 'w', encoding='utf-8')
-        log_print(f"📝 Log-Datei: {log_path}")
+        open_log_file(log_path)
+        log.info(f"📝 Log-Datei: {log_path}")
     except Exception as e:
         print(f"⚠️  Warnung: Konnte Log-Datei nicht erstellen: {e}", file=sys.stderr)
-        LOG_FILE = None
     
     # Überprüfe ob Credentials aus .env geladen wurden
     if not AGILITY_URL:
-        log_print("❌ Fehler: AGILITY_URL nicht in .env gefunden")
-        log_print("   Bitte fügen Sie AGILITY_URL=<url> zur .env-Datei hinzu.")
-        if LOG_FILE:
-            LOG_FILE.close()
+        log.error("❌ Fehler: AGILITY_URL nicht in .env gefunden")
+        log.info("   Bitte fügen Sie AGILITY_URL=<url> zur .env-Datei hinzu.")
+        close_log_file()
         sys.exit(1)
     
     if not THINGSBOARD_USERNAME or not THINGSBOARD_PASSWORD:
-        log_print("❌ Fehler: THINGBOARD_USERNAME oder THINGBOARD_PASSWORD nicht in .env gefunden")
-        log_print("   Bitte stellen Sie sicher, dass die .env-Datei existiert und die Variablen enthält.")
-        if LOG_FILE:
-            LOG_FILE.close()
+        log.error("❌ Fehler: THINGBOARD_USERNAME oder THINGBOARD_PASSWORD nicht in .env gefunden")
+        log.info("   Bitte stellen Sie sicher, dass die .env-Datei existiert und die Variablen enthält.")
+        close_log_file()
         sys.exit(1)
     
-    log_print(f"🌡️  ASSET TEMPERATURE SYNC TO DEVICES")
-    log_print(f"{'='*80}")
-    log_print(f"👤 Customer ID: {args.customer_id}")
-    log_print(f"🌐 ThingsBoard URL: {THINGSBOARD_BASE_URL}")
-    log_print(f"📡 Agility URL: {AGILITY_URL}")
-    log_print(f"🔌 FPort: {args.fport}")
-    if args.dry_run:
-        log_print(f"⚠️  DRY-RUN Modus aktiviert")
+    log.info(f"🌡️  ASSET TEMPERATURE SYNC TO DEVICES")
+    log.info(SEP_80)
+    log.info(f"👤 Customer ID: {args.customer_id}")
+    log.info(f"🌐 ThingsBoard URL: {THINGSBOARD_BASE_URL}")
+    log.info(f"📡 Agility URL: {AGILITY_URL}")
+    if AGILITY_BATCH_URL:
+        log.info(f"📦 Agility Batch-URL: {AGILITY_BATCH_URL}")
+    log.info(f"🔌 FPort: {fport}")
+    if dry_run:
+        log.warning(f"⚠️  DRY-RUN Modus aktiviert")
     if args.limit:
-        log_print(f"🔢 Limit: {args.limit} Devices")
-    log_print(f"⏰ Startzeit: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    log_print(f"{'='*80}\n")
+        log.info(f"🔢 Limit: {args.limit} Devices")
+    log.info(f"🧵 Parallele Requests: {args.concurrency}")
+    if args.rate_limit:
+        log.info(f"🚦 Rate-Limit: {args.rate_limit:g} Requests/s")
+    log.info(f"⏰ Startzeit: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    log.info(f"{SEP_80}\n")
     
     # Login
     if not login_to_thingsboard():
-        log_print("❌ Login fehlgeschlagen. Beende Programm.")
-        if LOG_FILE:
-            LOG_FILE.close()
+        log.error("❌ Login fehlgeschlagen. Beende Programm.")
+        close_log_file()
         sys.exit(1)
     
     # Customer-Assets abrufen
-    log_print(f"🔍 Hole Assets für Customer '{args.customer_id}'...")
+    log.info(f"🔍 Hole Assets für Customer '{args.customer_id}'...")
     assets = get_customer_assets(args.customer_id)
     
     if not assets:
-        log_print(f"❌ Keine Assets für diesen Customer gefunden.")
-        if LOG_FILE:
-            LOG_FILE.close()
+        log.error(f"❌ Keine Assets für diesen Customer gefunden.")
+        close_log_file()
         sys.exit(1)
     
-    log_print(f"✅ {len(assets)} Assets gefunden\n")
-    
-    # Statistik
-    stats = {
-        'assets_processed': 0,
-        'devices_processed': 0,
-        'min_temp_sent': 0,
-        'max_temp_sent': 0,
-        'combined_sent': 0,
-        'min_query_sent': 0,
-        'max_query_sent': 0,
-        'skipped_no_deveui': 0,
-        'skipped_no_asset_temp': 0,
-        'skipped_empty_min_temp': 0,
-        'skipped_empty_max_temp': 0,
-        'errors': 0
-    }
+    log.info(f"✅ {len(assets)} Assets gefunden\n")
+    
+    # Asset-Attribute, zugehörige Devices und Device-Attribute gesammelt vorab laden
+    asset_ids = [asset.get('id', {}).get('id', '') for asset in assets]
+    asset_attrs_by_id = fetch_asset_attributes(asset_ids)
+    temp_asset_ids = [
+        asset_id for asset_id in asset_ids
+        if asset_attrs_by_id[asset_id]['minTemp'] is not None or asset_attrs_by_id[asset_id]['maxTemp'] is not None
+    ]
+    asset_devices = fetch_all_relations(temp_asset_ids)
+    
+    device_ids = list(dict.fromkeys(
+        device.get('id', {}).get('id', '') for devices in asset_devices.values() for device in devices
+    ))
+    device_attrs_by_id = fetch_device_attributes(device_ids)
+    # DevEUI-Attribute nur für Devices, deren DevEUI nicht schon in Name, Label oder
+    # additionalInfo steht (None = Entity-Query nicht verfügbar, extract_deveui holt
+    # die Attribute dann selbst)
+    deveui_attr_ids = [
+        device.get('id', {}).get('id', '')
+        for devices in asset_devices.values() for device in devices
+        if deveui_from_device(device) is None
+    ]
+    deveui_attrs_by_id = bulk_fetch_attributes("DEVICE", list(dict.fromkeys(deveui_attr_ids)), DEVEUI_ATTRIBUTE_KEYS)
+    
+    # Statistik (Zähler nach Name, gesendete Downlinks nach Action)
+    stats = Counter()
     
     # Verarbeite jedes Asset
-    log_print(f"{'='*120}")
-    log_print(f"{'Asset Name':<30} {'Device Name':<30} {'DevEUI':<20} {'Aktion':<30} {'Details':<10}")
-    log_print(f"{'='*120}")
+    log.info(SEP_120)
+    log.info(TABLE_HEADER)
+    log.info(SEP_120)
     
-    # Zähler für Device-Limit
-    devices_processed_count = 0
+    # Sammle die zu verarbeitenden Devices (höchstens args.limit)
+    jobs = []
     limit_reached = False
     
-    for asset in assets:
+    for asset, asset_id in zip(assets, asset_ids):
         # Prüfe ob Limit erreicht wurde (vor der Asset-Verarbeitung)
         if limit_reached:
             break
             
-        asset_id = asset.get('id', {}).get('id', '')
-        asset_name = asset.get('name', 'Unbekannt')
+        asset_col = NAME_COL % asset.get('name', 'Unbekannt')
         
-        # Hole Asset-Attribute (minTemp, maxTemp)
-        asset_attrs = get_asset_attributes(asset_id)
+        # Asset-Attribute (minTemp, maxTemp)
+        asset_attrs = asset_attrs_by_id[asset_id]
         asset_min_temp = asset_attrs.get('minTemp')
         asset_max_temp = asset_attrs.get('maxTemp')
         
@@ -673,222 +1607,89 @@ Beispiele:
         
         stats['assets_processed'] += 1
         
-        # Hole zugehörige Devices
-        devices = get_asset_devices(asset_id)
-        
-        if not devices:
-            continue
-        
-        # Verarbeite jedes Device
-        for device in devices:
+        # Zugehörige Devices
+        for device in asset_devices[asset_id]:
             # Prüfe ob Limit erreicht wurde
-            if args.limit and devices_processed_count >= args.limit:
-                log_print(f"\n⚠️  Limit von {args.limit} Devices erreicht. Stoppe Verarbeitung.")
+            if args.limit and len(jobs) >= args.limit:
                 limit_reached = True
                 break
             
             device_id = device.get('id', {}).get('id', '')
-            device_name = device.get('name', 'Unbekannt')
-            
-            devices_processed_count += 1
-            stats['devices_processed'] += 1
-            
-            # Extrahiere DevEUI
-            deveui = extract_deveui(device)
-            
-            if not deveui:
-                log_print(f"{asset_name[:29]:<30} {device_name[:29]:<30} {'N/A':<20} {'❌ Kein DevEUI':<30} {'':<10}")
-                stats['skipped_no_deveui'] += 1
-                continue
-            
-            # Hole Device-Attribute (manu_temp_min, manu_temp_max)
-            device_attrs = get_device_attributes(device_id)
-            device_min_temp = device_attrs.get('manu_temp_min')
-            device_max_temp = device_attrs.get('manu_temp_max')
-            
-            # Normalisiere: Behandle leere Strings, 0, etc. als None
-            if device_min_temp == "" or device_min_temp == 0:
-                device_min_temp = None
-            if device_max_temp == "" or device_max_temp == 0:
-                device_max_temp = None
-            
-            # Prüfe ob Asset-Temperaturen vorhanden sind und gib Meldung aus wenn leer
-            if asset_min_temp is None:
-                log_print(f"{asset_name[:29]:<30} {device_name[:29]:<30} {deveui:<20} {'⚠️  Asset minTemp leer':<30} {'':<10}")
-                stats['skipped_empty_min_temp'] += 1
-            
-            if asset_max_temp is None:
-                log_print(f"{asset_name[:29]:<30} {device_name[:29]:<30} {deveui:<20} {'⚠️  Asset maxTemp leer':<30} {'':<10}")
-                stats['skipped_empty_max_temp'] += 1
-            
-            # Wenn beide Asset-Temperaturen leer sind, überspringe dieses Device
-            if asset_min_temp is None and asset_max_temp is None:
-                continue
-            
-            # Prüfe welche Temperaturen gesendet werden müssen (nur wenn Asset-Temp vorhanden)
-            needs_min = asset_min_temp is not None and (device_min_temp is None or device_min_temp != asset_min_temp)
-            needs_max = asset_max_temp is not None and (device_max_temp is None or device_max_temp != asset_max_temp)
-            
-            # Prüfe ob Queries nötig sind (nur wenn Device-Temp leer ist)
-            # WICHTIG: Explizit prüfen ob beide None sind für kombinierte Query
-            both_device_temps_none = device_min_temp is None and device_max_temp is None
-            min_is_query = needs_min and device_min_temp is None
-            max_is_query = needs_max and device_max_temp is None
-            
-            # Wenn beide gesendet werden müssen, prüfe ob kombiniert werden kann
-            if needs_min and needs_max:
-                # Prüfe zuerst: Beide Device-Temperaturen sind leer → Query senden (BDBF)
-                # WICHTIG: Explizit prüfen mit is None
-                device_min_is_none = (device_min_temp is None)
-                device_max_is_none = (device_max_temp is None)
-                
-                # Prüfe zuerst: Beide Device-Temperaturen sind leer → Query senden (BDBF)
-                if device_min_is_none and device_max_is_none:
-                    payload = combine_query_payloads()  # Gibt "BDBF" zurück
-                    action = "📤 Query Min/Max Temp"
-                    # Ausgabe VOR dem Senden
-                    log_print(f"{asset_name[:29]:<30} {device_name[:29]:<30} {deveui:<20} {action:<30} {'':<10}")
-                    success = send_downlink_to_agility(deveui, args.fport, payload, args.dry_run)
-                    if success:
-                        stats['min_query_sent'] += 1
-                        stats['max_query_sent'] += 1
-                        stats['combined_sent'] += 1
-                    else:
-                        log_print(f"{asset_name[:29]:<30} {device_name[:29]:<30} {deveui:<20} {'❌ Fehler Query Min/Max':<30} {'':<10}")
-                        stats['errors'] += 1
-                # Beide Device-Temperaturen sind vorhanden → Set senden
-                elif not device_min_is_none and not device_max_is_none:
-                    payload = combine_temperature_payloads(asset_min_temp, asset_max_temp)
-                    if payload:
-                        # Füge Query-Hex-Werte hinten an (BDBF)
-                        query_payload = combine_query_payloads()  # Gibt "BDBF" zurück
-                        payload = payload + query_payload  # z.B. "3E144030" + "BDBF" = "3E144030BDBF"
-                        action = f"📤 Set Min/Max ({asset_min_temp}°C/{asset_max_temp}°C)"
-                        # Ausgabe VOR dem Senden
-                        log_print(f"{asset_name[:29]:<30} {device_name[:29]:<30} {deveui:<20} {action:<30} {'':<10}")
-                        success = send_downlink_to_agility(deveui, args.fport, payload, args.dry_run)
-                        if success:
-                            stats['min_temp_sent'] += 1
-                            stats['max_temp_sent'] += 1
-                            stats['combined_sent'] += 1
-                        else:
-                            log_print(f"{asset_name[:29]:<30} {device_name[:29]:<30} {deveui:<20} {'❌ Fehler Min/Max':<30} {'':<10}")
-                            stats['errors'] += 1
-                else:
-                    # Eine Query, eine Temperatur → einzeln senden
-                    # Prüfe und sende minTemp
-                    if needs_min:
-                        if min_is_query:
-                            # Query senden (BD)
-                            payload = get_query_payload(is_min=True)
-                            action = "📤 Query Min Temp"
-                            stats['min_query_sent'] += 1
-                        else:
-                            # Temperatur senden (3E + temp*2)
-                            payload = temperature_to_hex_payload(asset_min_temp, is_min=True)
-                            action = f"📤 Set Min Temp ({asset_min_temp}°C)"
-                            stats['min_temp_sent'] += 1
-                        
-                        if payload:
-                            success = send_downlink_to_agility(deveui, args.fport, payload, args.dry_run)
-                            if success:
-                                log_print(f"{asset_name[:29]:<30} {device_name[:29]:<30} {deveui:<20} {action:<30} {'':<10}")
-                            else:
-                                log_print(f"{asset_name[:29]:<30} {device_name[:29]:<30} {deveui:<20} {'❌ Fehler Min':<30} {'':<10}")
-                                stats['errors'] += 1
-                    
-                    # Prüfe und sende maxTemp
-                    if needs_max:
-                        if max_is_query:
-                            # Query senden (BF)
-                            payload = get_query_payload(is_min=False)
-                            action = "📤 Query Max Temp"
-                            stats['max_query_sent'] += 1
-                        else:
-                            # Temperatur senden (40 + temp*2)
-                            payload = temperature_to_hex_payload(asset_max_temp, is_min=False)
-                            action = f"📤 Set Max Temp ({asset_max_temp}°C)"
-                            stats['max_temp_sent'] += 1
-                        
-                        if payload:
-                            success = send_downlink_to_agility(deveui, args.fport, payload, args.dry_run)
-                            if success:
-                                log_print(f"{asset_name[:29]:<30} {device_name[:29]:<30} {deveui:<20} {action:<30} {'':<10}")
-                            else:
-                                log_print(f"{asset_name[:29]:<30} {device_name[:29]:<30} {deveui:<20} {'❌ Fehler Max':<30} {'':<10}")
-                                stats['errors'] += 1
-            else:
-                # Nur eine Temperatur → einzeln senden
-                # Prüfe und sende minTemp
-                if needs_min:
-                    if min_is_query:
-                        # Query senden (BD)
-                        payload = get_query_payload(is_min=True)
-                        action = "📤 Query Min Temp"
-                        stats['min_query_sent'] += 1
-                    else:
-                        # Temperatur senden (3E + temp*2)
-                        payload = temperature_to_hex_payload(asset_min_temp, is_min=True)
-                        action = f"📤 Set Min Temp ({asset_min_temp}°C)"
-                        stats['min_temp_sent'] += 1
-                    
-                    if payload:
-                        success = send_downlink_to_agility(deveui, args.fport, payload, args.dry_run)
-                        if success:
-                            log_print(f"{asset_name[:29]:<30} {device_name[:29]:<30} {deveui:<20} {action:<30} {'':<10}")
-                        else:
-                            log_print(f"{asset_name[:29]:<30} {device_name[:29]:<30} {deveui:<20} {'❌ Fehler Min':<30} {'':<10}")
-                            stats['errors'] += 1
-                
-                # Prüfe und sende maxTemp
-                if needs_max:
-                    if max_is_query:
-                        # Query senden (BF)
-                        payload = get_query_payload(is_min=False)
-                        action = "📤 Query Max Temp"
-                        stats['max_query_sent'] += 1
-                    else:
-                        # Temperatur senden (40 + temp*2)
-                        payload = temperature_to_hex_payload(asset_max_temp, is_min=False)
-                        action = f"📤 Set Max Temp ({asset_max_temp}°C)"
-                        stats['max_temp_sent'] += 1
-                    
-                    if payload:
-                        success = send_downlink_to_agility(deveui, args.fport, payload, args.dry_run)
-                        if success:
-                            log_print(f"{asset_name[:29]:<30} {device_name[:29]:<30} {deveui:<20} {action:<30} {'':<10}")
-                        else:
-                            log_print(f"{asset_name[:29]:<30} {device_name[:29]:<30} {deveui:<20} {'❌ Fehler Max':<30} {'':<10}")
-                            stats['errors'] += 1
-    
-    log_print(f"{'='*120}\n")
-    
-    # Zusammenfassung
-    log_print(f"📊 ZUSAMMENFASSUNG")
-    log_print(f"{'='*80}")
-    log_print(f"Assets verarbeitet: {stats['assets_processed']}")
-    log_print(f"Devices verarbeitet: {stats['devices_processed']}")
-    log_print(f"Min Temp gesendet: {stats['min_temp_sent']}")
-    log_print(f"Max Temp gesendet: {stats['max_temp_sent']}")
-    log_print(f"Kombinierte Requests: {stats['combined_sent']}")
-    log_print(f"Min Query gesendet: {stats['min_query_sent']}")
-    log_print(f"Max Query gesendet: {stats['max_query_sent']}")
-    log_print(f"Übersprungen (kein DevEUI): {stats['skipped_no_deveui']}")
-    log_print(f"Übersprungen (keine Asset-Temp): {stats['skipped_no_asset_temp']}")
-    log_print(f"Übersprungen (Asset minTemp leer): {stats['skipped_empty_min_temp']}")
-    log_print(f"Übersprungen (Asset maxTemp leer): {stats['skipped_empty_max_temp']}")
-    log_print(f"Fehler: {stats['errors']}")
-    log_print(f"FPort: {args.fport}")
-    if args.dry_run:
-        log_print(f"Modus: DRY-RUN (keine Nachrichten gesendet)")
-    log_print(f"{'='*80}\n")
-    
-    log_print(f"✅ Verarbeitung abgeschlossen!")
+            deveui_attrs = deveui_attrs_by_id.get(device_id, {}) if deveui_attrs_by_id is not None else None
+            jobs.append((asset_col, asset_min_temp, asset_max_temp, device,
+                         device_attrs_by_id[device_id], deveui_attrs))
+    
+    stats['devices_processed'] = len(jobs)
+    
+    # Devices parallel verarbeiten, danach alle Downlinks gesammelt senden
+    results = fetch_parallel(lambda job: buffered_call(process_device, job), jobs)
+    downlinks = [downlink for (_, downlink), _ in results if downlink]
+    send_results = iter(send_downlinks_to_agility(
+        [(deveui, payload) for deveui, payload, _, _ in downlinks], fport, dry_run
+    ))
+    
+    # Ausgaben in der ursprünglichen Reihenfolge
+    for job, ((device_stats, downlink), output) in zip(jobs, results):
+        if device_stats:  # meist leer
+            stats.update(device_stats)
+        if downlink:
+            success, send_output = next(send_results)
+            output = output + send_output
+        for record in output:
+            log.handle(record)
+        if not downlink:
+            continue
+        
+        _, _, action, row_prefix = downlink
+        if success:
+            stats[action] += 1
+        else:
+            log.error(ROW_FMT, row_prefix or format_row_prefix(job[0], job[3], downlink[0]), action.error_label)
+            stats['errors'] += 1
+    
+    if limit_reached:
+        log.info(f"\n⚠️  Limit von {args.limit} Devices erreicht. Stoppe Verarbeitung.")
+    
+    log.info(f"{SEP_120}\n")
+    
+    # Gesendete Downlinks auf die Zähler der Zusammenfassung verteilen
+    for action in Action:
+        for key in action.counters:
+            stats[key] += stats[action]
+    
+    # Zusammenfassung (als ein Log-Eintrag)
+    summary = [
+        f"📊 ZUSAMMENFASSUNG",
+        SEP_80,
+        f"Assets verarbeitet: {stats['assets_processed']}",
+        f"Devices verarbeitet: {stats['devices_processed']}",
+        f"Min Temp gesendet: {stats['min_temp_sent']}",
+        f"Max Temp gesendet: {stats['max_temp_sent']}",
+        f"Kombinierte Requests: {stats['combined_sent']}",
+        f"Min Query gesendet: {stats['min_query_sent']}",
+        f"Max Query gesendet: {stats['max_query_sent']}",
+        f"Übersprungen (kein DevEUI): {stats['skipped_no_deveui']}",
+        f"Übersprungen (keine Asset-Temp): {stats['skipped_no_asset_temp']}",
+        f"Übersprungen (Asset minTemp leer): {stats['skipped_empty_min_temp']}",
+        f"Übersprungen (Asset maxTemp leer): {stats['skipped_empty_max_temp']}",
+        f"Fehler: {stats['errors']}",
+        f"FPort: {fport}",
+    ]
+    for name, session in (("Thingsboard", TB_SESSION), ("Agility", AG_SESSION)):
+        metrics = session.metrics
+        summary.append(f"HTTP {name}: {metrics['requests']} Requests, max. {metrics['max_active']} gleichzeitig, "
+                       f"max. {metrics['max_queued']} wartend, {metrics['failed']} fehlgeschlagen")
+    if dry_run:
+        summary.append(f"Modus: DRY-RUN (keine Nachrichten gesendet)")
+    summary.append(f"{SEP_80}\n")
+    log.info("\n".join(summary))
+    
+    log.info(f"✅ Verarbeitung abgeschlossen!")
     
     # Schließe Log-Datei
-    if LOG_FILE:
-        LOG_FILE.close()
-        log_print(f"📝 Log-Datei gespeichert: {log_path}")
+    if _file_handler:
+        close_log_file()
+        log.info(f"📝 Log-Datei gespeichert: {log_path}")
 
 
 if __name__ == "__main__":